@@ -0,0 +1,105 @@
+"""
+Deterministic synthetic inputs for the benchmarks.
+
+    python -m benchmarks.fixtures --out ./benchmarks/fixtures
+
+writes soil/*.jpg (textured soil-coloured photos), weeds/*.jpg (green plants on bare soil),
+soil_rows.csv (soil-test rows spanning the crop model's feature ranges) and queries.json (chat and
+historic-data questions). The same seed always produces the same files.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.crop_engine import CROP_FEATURES
+
+
+SOIL_COLOURS = [(120, 92, 60), (45, 40, 38), (150, 110, 90), (160, 70, 45)]
+CROP_FEATURE_RANGES = {
+    "N": (0, 140), "P": (5, 145), "K": (5, 205), "temperature": (8, 44),
+    "humidity": (14, 100), "ph": (3.5, 9.9), "rainfall": (20, 300),
+}
+CHAT_QUERIES = [
+    "Which crops grow best in black soil?",
+    "How do I treat yellowing leaves on my tomato plants?",
+    "What fertilizer should I use for rice during tillering?",
+    "How much water does wheat need in the first month?",
+]
+HISTORIC_QUERIES = [
+    "What was the total rice production in Punjab in 2010?",
+    "Which district produced the most wheat in 2005?",
+    "How did maize yield in Karnataka change between 2000 and 2010?",
+    "List the top three crops by area in Bihar in 2012.",
+]
+
+
+def soil_image(rng, size=1024):
+    base = np.array(SOIL_COLOURS[rng.integers(len(SOIL_COLOURS))], dtype=np.float32)
+    # Coarse and fine noise for clods and grain.
+    coarse = np.kron(rng.normal(0, 18, (size // 32, size // 32, 3)), np.ones((32, 32, 1)))
+    fine = rng.normal(0, 10, (size, size, 3))
+    pixels = np.clip(base + coarse + fine, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(1))
+
+
+def weed_image(rng, size=1280, plants=12):
+    img = soil_image(rng, size)
+    draw = ImageDraw.Draw(img)
+    for _ in range(plants):
+        cx, cy = rng.integers(50, size - 50, 2)
+        for _ in range(rng.integers(4, 9)):
+            dx, dy = rng.normal(0, 18, 2)
+            r = rng.integers(8, 30)
+            green = (int(rng.integers(30, 80)), int(rng.integers(110, 190)), int(rng.integers(20, 70)))
+            draw.ellipse([cx + dx - r, cy + dy - r / 2, cx + dx + r, cy + dy + r / 2], fill=green)
+    return img
+
+
+def soil_rows(rng, n):
+    low = np.array([CROP_FEATURE_RANGES[name][0] for name in CROP_FEATURES])
+    high = np.array([CROP_FEATURE_RANGES[name][1] for name in CROP_FEATURES])
+    return np.round(rng.uniform(low, high, size=(n, len(CROP_FEATURES))), 2)
+
+
+def write_fixtures(out, n_soil=16, n_weeds=8, n_rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    for name in ("soil", "weeds"):
+        os.makedirs(os.path.join(out, name), exist_ok=True)
+    for i in range(n_soil):
+        soil_image(rng).save(os.path.join(out, "soil", f"soil_{i:03d}.jpg"), quality=90)
+    for i in range(n_weeds):
+        weed_image(rng).save(os.path.join(out, "weeds", f"weeds_{i:03d}.jpg"), quality=90)
+
+    with open(os.path.join(out, "soil_rows.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CROP_FEATURES)
+        writer.writerows(soil_rows(rng, n_rows).tolist())
+    with open(os.path.join(out, "queries.json"), "w") as f:
+        json.dump({"chat": CHAT_QUERIES, "historic": HISTORIC_QUERIES}, f, indent=2)
+    return out
+
+
+def load_fixtures(out):
+    """Reads the fixture files back as request payloads: image bytes, soil-test dicts and query lists."""
+    def read_images(name):
+        directory = os.path.join(out, name)
+        return [open(os.path.join(directory, file), "rb").read() for file in sorted(os.listdir(directory))]
+
+    with open(os.path.join(out, "soil_rows.csv")) as f:
+        rows = [{key: float(value) for key, value in row.items()} for row in csv.DictReader(f)]
+    with open(os.path.join(out, "queries.json")) as f:
+        queries = json.load(f)
+    return {"soil": read_images("soil"), "weeds": read_images("weeds"), "rows": rows, **queries}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="./benchmarks/fixtures")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print("Wrote fixtures to", write_fixtures(args.out, seed=args.seed))
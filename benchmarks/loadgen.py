@@ -0,0 +1,124 @@
+"""
+Closed-loop HTTP load generator: `concurrency` clients each send requests back to back for `duration`
+seconds, and every response is read to the end. Reports requests per second, latency percentiles
+and, for streaming endpoints, time to the first body chunk.
+"""
+import asyncio
+import itertools
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+
+def _crop(fixtures, i):
+    return {"method": "POST", "url": "/predictCrop", "json": fixtures["rows"][i % len(fixtures["rows"])]}
+
+
+def _soil(fixtures, i):
+    image = fixtures["soil"][i % len(fixtures["soil"])]
+    return {"method": "POST", "url": "/predictSoil", "files": {"file": ("soil.jpg", image, "image/jpeg")}}
+
+
+def _weeds(fixtures, i):
+    image = fixtures["weeds"][i % len(fixtures["weeds"])]
+    return {"method": "POST", "url": "/detect-weeds", "params": {"format": "json"}, "files": {"file": ("weeds.jpg", image, "image/jpeg")}}
+
+
+def _chat(fixtures, i):
+    # A new thread per request: turns on one thread are serialized, which would measure the lock instead.
+    query = fixtures["chat"][i % len(fixtures["chat"])]
+    return {"method": "POST", "url": "/chatWithLLM", "data": {"thread_id": f"bench-{_run_id}-{i}", "query": query}}
+
+
+def _chat_image(fixtures, i):
+    request = _chat(fixtures, i)
+    image = fixtures["soil"][i % len(fixtures["soil"])]
+    return {**request, "files": {"image": ("field.jpg", image, "image/jpeg")}}
+
+
+def _historic(fixtures, i):
+    # Numbered so every request misses the response cache and exercises the agent.
+    query = fixtures["historic"][i % len(fixtures["historic"])]
+    return {"method": "POST", "url": "/chatHistoricModel", "data": {"text": f"{query} (request {_run_id}-{i})"}}
+
+
+SCENARIOS = {
+    "predictCrop": _crop,
+    "predictSoil": _soil,
+    "detect-weeds": _weeds,
+    "chatWithLLM": _chat,
+    "chatWithLLM-image": _chat_image,
+    "chatHistoricModel": _historic,
+}
+# Streaming endpoints answer 200 and report failures inside the body.
+STREAM_ERROR_MARKER = b"[Error]"
+# Shared by every level and tagged per process, so chat threads and historic queries never repeat,
+# even against a server that persists its checkpoints or response cache between benchmark runs.
+_run_id = uuid.uuid4().hex[:8]
+_request_ids = itertools.count()
+
+
+async def _send(client, request):
+    start = time.perf_counter()
+    first_chunk = None
+    failed = False
+    async with client.stream(**request) as response:
+        async for chunk in response.aiter_bytes():
+            if first_chunk is None and chunk:
+                first_chunk = time.perf_counter() - start
+            failed = failed or STREAM_ERROR_MARKER in chunk
+    return time.perf_counter() - start, first_chunk, response.status_code == 200 and not failed
+
+
+def _summary(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)}
+
+
+async def run_level(base_url, scenario, fixtures, concurrency, duration, timeout=120):
+    """Runs one scenario at one concurrency level and returns its statistics."""
+    make_request = SCENARIOS[scenario]
+    latencies, first_chunks, errors = [], [], 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            try:
+                latency, first_chunk, ok = await _send(client, make_request(fixtures, next(_request_ids)))
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if not ok:
+                errors += 1
+                continue
+            latencies.append(latency)
+            if first_chunk is not None:
+                first_chunks.append(first_chunk)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "latency": _summary(latencies),
+        "first_chunk": _summary(first_chunks),
+    }
+
+
+async def run_scenario(base_url, scenario, fixtures, concurrency_levels, duration, warmup=2):
+    """Runs `scenario` at every concurrency level, after an untimed warm-up at the lowest one."""
+    if warmup:
+        await run_level(base_url, scenario, fixtures, min(concurrency_levels), warmup)
+    return [await run_level(base_url, scenario, fixtures, level, duration) for level in concurrency_levels]
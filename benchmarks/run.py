@@ -0,0 +1,174 @@
+"""
+Offline benchmark of the API endpoints, with the LLM providers replaced by a local stand-in.
+
+    python -m benchmarks.run --scenarios predictCrop,chatWithLLM --concurrency 1,4,16 --duration 10
+
+generates the fixtures if needed, starts the stub LLM server and the app (uvicorn, or the multi-worker
+launcher with --workers), warms each scenario up untimed (which loads its models), then writes one JSON file with
+RPS and p50/p95/p99 latency per scenario and concurrency level to benchmarks/results/.
+
+    python -m benchmarks.run --base-url http://127.0.0.1:8000 ...
+
+benchmarks an already running server instead. To compare two runs, and exit with status 1 if
+throughput dropped or p99 latency rose by more than --threshold:
+
+    python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fixtures import load_fixtures, write_fixtures
+from benchmarks.loadgen import SCENARIOS, run_scenario
+from benchmarks.stub_llm import StubLLMServer
+from src.testing import fake_credentials
+
+
+# Models the multi-worker launcher preloads for each scenario.
+SCENARIO_PRELOAD = {
+    "predictCrop": ["crop"],
+    "predictSoil": ["soil"],
+    "detect-weeds": ["weeds"],
+    "chatWithLLM": [],
+    "chatWithLLM-image": [],
+    "chatHistoricModel": ["historic_store"],
+}
+
+
+def start_app(port, stub_url, scenarios, workers=None):
+    env = {
+        **os.environ,
+        "GEMINI_BASE_URL": stub_url,
+        "GROQ_BASE_URL": stub_url,
+        "GOOGLE_API_KEY": "stub",
+        "GROQ_API_KEY": "stub",
+        "GOOGLE_CREDENTIALS_BASE64": fake_credentials(f"{stub_url}/token"),
+        # Only the models the scenarios use get loaded, by the untimed warm-up requests.
+        "MODEL_LOADING": "lazy",
+        "PRELOAD_MODELS": ",".join(sorted({model for scenario in scenarios for model in SCENARIO_PRELOAD[scenario]})),
+    }
+    if workers:
+        command = ["-m", "src.launcher", "--workers", str(workers)]
+    else:
+        command = ["-m", "uvicorn", "main:app", "--log-level", "warning"]
+    return subprocess.Popen([sys.executable, *command, "--host", "127.0.0.1", "--port", str(port)], env=env)
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def benchmark(args):
+    from src.launcher import wait_until_up
+
+    scenarios = args.scenarios.split(",")
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios {unknown}, expected any of {list(SCENARIOS)}.")
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    if not os.path.exists(os.path.join(args.fixtures, "queries.json")):
+        write_fixtures(args.fixtures)
+    fixtures = load_fixtures(args.fixtures)
+
+    stub, app = None, None
+    base_url = args.base_url
+    if base_url is None:
+        stub = StubLLMServer(ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens).start()
+        app = start_app(args.port, stub.url, scenarios, args.workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        wait_until_up(base_url, "/health/live")
+        results = []
+        for scenario in scenarios:
+            for result in asyncio.run(run_scenario(base_url, scenario, fixtures, concurrency_levels, args.duration)):
+                results.append(result)
+                latency = result["latency"] or {}
+                print(
+                    f"{scenario:20s} c={result['concurrency']:<4d} rps={result['rps']:<9} "
+                    f"p50={latency.get('p50_ms')}ms p95={latency.get('p95_ms')}ms p99={latency.get('p99_ms')}ms "
+                    f"errors={result['errors']}",
+                    flush=True,
+                )
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+        if stub is not None:
+            stub.shutdown()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "base_url": args.base_url or "local",
+            "workers": args.workers,
+            "duration_seconds": args.duration,
+            "stub_llm": None if args.base_url else {"ttft_ms": args.ttft_ms, "token_ms": args.token_ms, "tokens": args.tokens},
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join("benchmarks", "results", f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote", out)
+
+
+def compare(old_path, new_path, threshold=0.1):
+    """Prints RPS and p99 changes per scenario and level; returns the number of regressions."""
+    with open(old_path) as f:
+        old = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        rps_change = (after["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0.0
+        p99_before = (before["latency"] or {}).get("p99_ms")
+        p99_after = (after["latency"] or {}).get("p99_ms")
+        p99_change = (p99_after - p99_before) / p99_before if p99_before and p99_after else 0.0
+        regressed = rps_change < -threshold or p99_change > threshold
+        regressions += regressed
+        print(
+            f"{key[0]:20s} c={key[1]:<4d} rps {before['rps']} -> {after['rps']} ({rps_change:+.1%})  "
+            f"p99 {p99_before} -> {p99_after}ms ({p99_change:+.1%}){'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="predictCrop,predictSoil,detect-weeds,chatWithLLM,chatHistoricModel", help=f"Comma-separated subset of {list(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario and level")
+    parser.add_argument("--base-url", help="Benchmark this running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8799, help="Port for the app started by the benchmark")
+    parser.add_argument("--workers", type=int, help="Start the app with the multi-worker launcher")
+    parser.add_argument("--fixtures", default="./benchmarks/fixtures")
+    parser.add_argument("--ttft-ms", type=float, default=400, help="Stub LLM latency to the first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Stub LLM latency per following token")
+    parser.add_argument("--tokens", type=int, default=40, help="Stub LLM tokens per answer")
+    parser.add_argument("--out", help="Result file (default: benchmarks/results/<time>-<revision>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, threshold=args.threshold) else 0)
+    benchmark(args)
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the Gemini and Groq APIs, so the app can be load-tested offline at a known LLM latency.
+
+    python -m benchmarks.stub_llm --port 9911 --ttft-ms 400 --token-ms 20 --tokens 40
+
+Point the app at it with GEMINI_BASE_URL=http://127.0.0.1:9911 and GROQ_BASE_URL=http://127.0.0.1:9911.
+It answers:
+- POST .../models/<model>:generateContent and :streamGenerateContent (google-genai, used by
+  process_image_gemini), the latter as server-sent events, one chunk per token.
+- POST /openai/v1/chat/completions (Groq, used by process_image_llama), streamed if requested.
+- POST /token, an OAuth token for service-account credentials whose token_uri points here.
+- Any other POST (the LangChain Gemini client posts to the bare base URL) as one generateContent
+  response, sent once the whole answer would have been generated.
+
+Each answer takes `ttft_ms` before the first token and `token_ms` per token after that. The text
+ends in a ReAct "Final Answer:" line, so the pandas agent finishes in a single step.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+ANSWER_PREFIX = "Thought: I now know the final answer\nFinal Answer: "
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer writes so headers and body leave in one segment instead of stalling on delayed ACKs.
+    wbufsize = -1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        self.server.requests += 1
+        if self.path.startswith("/token"):
+            return self._send_json({"access_token": "stub", "expires_in": 3600, "token_type": "Bearer"})
+
+        tokens = self.server.answer_tokens()
+        if "/chat/completions" in self.path:
+            stream = json.loads(body or b"{}").get("stream", False)
+            return self._groq(tokens, stream)
+        if ":streamGenerateContent" in self.path:
+            return self._gemini_stream(tokens)
+        self._wait_for(tokens)
+        return self._send_json(_gemini_chunk("".join(tokens)))
+
+    def _wait_for(self, tokens):
+        time.sleep((self.server.ttft_ms + self.server.token_ms * max(len(tokens) - 1, 0)) / 1000)
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_events(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.server.ttft_ms / 1000)
+        for i, event in enumerate(events):
+            if i:
+                time.sleep(self.server.token_ms / 1000)
+            data = f"data: {event}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _gemini_stream(self, tokens):
+        self._send_events(json.dumps(_gemini_chunk(token)) for token in tokens)
+
+    def _groq(self, tokens, stream):
+        if not stream:
+            self._wait_for(tokens)
+            return self._send_json({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": len(tokens), "total_tokens": len(tokens) + 1},
+            })
+        chunks = [
+            json.dumps({
+                "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            })
+            for token in tokens
+        ]
+        self._send_events(chunks + ["[DONE]"])
+
+
+def _gemini_chunk(text):
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2},
+    }
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections when hundreds of chats open them at once.
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=0, ttft_ms=400, token_ms=20, tokens=40):
+        super().__init__((host, port), StubLLMHandler)
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def answer_tokens(self):
+        words = ["Stub answer about crops and soil."] + [" word"] * max(self.tokens - 2, 0)
+        return [ANSWER_PREFIX] + words[: max(self.tokens - 1, 0)]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9911)
+    parser.add_argument("--ttft-ms", type=float, default=400, help="Latency before the first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="Latency of each following token")
+    parser.add_argument("--tokens", type=int, default=40, help="Tokens per answer")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.ttft_ms, args.token_ms, args.tokens)
+    print(f"Stub LLM server on {server.url}", flush=True)
+    server.serve_forever()
@@ -1,25 +1,88 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image
+from contextlib import asynccontextmanager
 from io import BytesIO
-from typing import Optional
-import base64
+from PIL import Image
+from typing import List, Literal, Optional
+import asyncio
+import itertools
+import json
+import os
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+
+from src.schema import SoilInput, SoilBatchInput, CropSweepInput
+from src.model_arch import load_crop_recommendation_model, load_crop_engine, load_soil_type_detection_model, load_gemini,load_csv_executor, load_weed_detector
+from src.batcher import MicroBatcher
+from src.executor import InferenceBusyError, load_inference_executor
+from src.metrics import render_metrics, stage_timer, track_inference
+from src.crop_engine import CROP_FEATURES
+from src.historic_store import GROUP_BY_COLUMNS, load_historic_store
+from src.response_cache import load_response_cache
+from src.plan_cache import load_plan_cache
+from src.image_store import image_store
+from src.registry import load_model_registry
+from src.orthomosaic import Orthomosaic, detect_weeds_tiled, render_overview
+from src.weed_video import WeedTracker, iter_image_frames, iter_video_frames, track_weeds, video_info
+from src.helper import crop_recommendation_prediction,crop_recommendation_batch_prediction,crop_sweep_label_indices,crop_sweep_chunk,crop_sweep,decode_soil_image,soil_image_to_tensor,SOIL_IMAGE_SIZE,soil_type_batch_prediction,iter_soil_archive,decode_soil_images,spool_upload,query_historic_data_llm,chat_with_llm, detect_weeds_from_image, detect_weeds_as_json, WEED_IMAGE_ENCODINGS
+
+## Models are registered here and loaded on first use or in the background once the app starts (MODEL_LOADING).
+model_registry = load_model_registry()
+
+
+def _load_crop():
+    crop_recommendation_model, label_encoder, preprocessor = load_crop_recommendation_model()
+    return load_crop_engine(crop_recommendation_model, preprocessor), label_encoder
+
+
+model_registry.register("crop", _load_crop, warmup=lambda crop: crop_recommendation_prediction([0.0] * len(CROP_FEATURES), *crop))
+model_registry.register("soil", load_soil_type_detection_model, warmup=lambda model: soil_type_batch_prediction([soil_image_to_tensor(Image.new("RGB", SOIL_IMAGE_SIZE))], model))
+model_registry.register("gemini", load_gemini)
+model_registry.register("historic_store", load_historic_store)
+model_registry.register("historic_agent", lambda: load_csv_executor(model_registry.get("gemini"), model_registry.get("historic_store")))
+model_registry.register("weeds", load_weed_detector, warmup=lambda detector: detector(np.zeros((640, 640, 3), np.uint8), verbose=False))
 
-from src.schema import SoilInput
-from src.model_arch import load_crop_recommendation_model, load_soil_type_detection_model, load_gemini,load_csv_executor, load_weed_detector
-from src.helper import crop_recommendation_prediction,soil_type_prediction,query_historic_data_llm,chat_with_llm, detect_weeds_from_image
+historic_response_cache = load_response_cache("historic")
+historic_plan_cache = load_plan_cache(lambda: model_registry.get("historic_store"))
 
-## Pre-Load necessary items.
-crop_recommendation_model, label_encoder, preprocessor = load_crop_recommendation_model()
-soil_detection_model = load_soil_type_detection_model()
-llm_gemini = load_gemini()
-agent_executor = load_csv_executor(llm_gemini)
-weed_detector = load_weed_detector()
+## Inference runs on a dedicated pool, never on the event loop.
+inference_executor = load_inference_executor()
+
+## Micro-batchers: concurrent requests are merged into one forward pass.
+soil_batcher = MicroBatcher(
+    lambda image_tensors: soil_type_batch_prediction(image_tensors, model_registry.get("soil")),
+    max_batch_size=int(os.getenv("SOIL_BATCH_MAX_SIZE", "8")),
+    max_wait_ms=float(os.getenv("SOIL_BATCH_MAX_WAIT_MS", "10")),
+    name="soil",
+    max_queue=inference_executor.max_queue,
+)
+
+crop_batcher = None
+if os.getenv("CROP_MICRO_BATCHING", "0") == "1":
+    crop_batcher = MicroBatcher(
+        lambda rows: [
+            {"top_3_predictions": row["top_k_predictions"]}
+            for row in crop_recommendation_batch_prediction(rows, *model_registry.get("crop"))
+        ],
+        max_batch_size=int(os.getenv("CROP_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.getenv("CROP_BATCH_MAX_WAIT_MS", "2")),
+        name="crop",
+        max_queue=inference_executor.max_queue,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Started per worker once the app is up, never at import time.
+    model_registry.start(os.getenv("MODEL_LOADING", "background"))
+    yield
 
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allows all origins
@@ -33,36 +96,406 @@ def root():
     return "Online"
 
 
+@app.get("/health/live")
+def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+def health_ready():
+    # The CPU models by default: a replica without the historic CSV or an LLM connection still serves them.
+    required = os.getenv("MODEL_READY_REQUIRED", "crop,soil,weeds")
+    ready = model_registry.is_ready(None if required == "all" else [name for name in required.split(",") if name])
+    body = {"status": "ready" if ready else "loading", "models": model_registry.status()}
+    return Response(content=json.dumps(body), media_type="application/json", status_code=200 if ready else 503)
+
+
 @app.post("/predictCrop")
-def predict(data: SoilInput):
+async def predict(data: SoilInput):
     try:
         data = data.to_list()
-        return crop_recommendation_prediction(data,crop_recommendation_model,label_encoder,preprocessor)
+        with track_inference("crop"):
+            if crop_batcher is not None:
+                return await crop_batcher.submit_async(data)
+            crop_engine, label_encoder = await model_registry.aget("crop")
+            return await inference_executor.run("crop", crop_recommendation_prediction, data, crop_engine, label_encoder)
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+## One batch request may not tie up the inference pool with an arbitrarily large matrix.
+CROP_BATCH_MAX_ROWS = int(os.getenv("CROP_BATCH_MAX_ROWS", "100000"))
+
+
+class BatchTooLargeError(ValueError):
+    pass
+
+
+def _too_many_rows(n_rows):
+    return BatchTooLargeError(f"A batch may have at most {CROP_BATCH_MAX_ROWS} rows, got {n_rows}.")
+
+
+@app.post("/predictCrop/batch")
+async def predict_batch(data: SoilBatchInput):
+    if len(data.records) > CROP_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=str(_too_many_rows(len(data.records))))
+    try:
+        with track_inference("crop_batch"):
+            crop_engine, label_encoder = await model_registry.aget("crop")
+            predictions = await inference_executor.run("crop", crop_recommendation_batch_prediction, data.to_matrix(), crop_engine, label_encoder, top_k=data.top_k)
+        return {"predictions": predictions}
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _predict_csv(file, top_k):
+    with stage_timer("crop", "decode"):
+        # One row past the limit is enough to know the upload is too large.
+        input_df = pd.read_csv(file, usecols=CROP_FEATURES, nrows=CROP_BATCH_MAX_ROWS + 1)
+    if len(input_df) > CROP_BATCH_MAX_ROWS:
+        raise _too_many_rows(f"more than {CROP_BATCH_MAX_ROWS}")
+    crop_engine, label_encoder = model_registry.get("crop")
+    return crop_recommendation_batch_prediction(input_df[CROP_FEATURES].to_numpy(),crop_engine,label_encoder,top_k=top_k)
+
+
+@app.post("/predictCrop/batch/csv")
+async def predict_batch_csv(file: UploadFile = File(...), top_k: int = Form(3, ge=1, le=22)):
+    try:
+        with track_inference("crop_batch"):
+            predictions = await inference_executor.run("crop", _predict_csv, file.file, top_k)
+        return {"predictions": predictions}
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=str(e))
 
 
+## What-if sweeps: grids above CROP_SWEEP_MAX_JSON_POINTS must be streamed as NDJSON.
+CROP_SWEEP_MAX_POINTS = int(os.getenv("CROP_SWEEP_MAX_POINTS", "1000000"))
+CROP_SWEEP_MAX_JSON_POINTS = int(os.getenv("CROP_SWEEP_MAX_JSON_POINTS", "50000"))
+CROP_SWEEP_CHUNK_SIZE = int(os.getenv("CROP_SWEEP_CHUNK_SIZE", "8192"))
+
+
+def _sweep_json(header, base_row, axes, crop_engine, label_indices, decimals):
+    probs = crop_sweep(base_row, axes, crop_engine, label_indices, chunk_size=CROP_SWEEP_CHUNK_SIZE)
+    # Serialized here, off the event loop: FastAPI's encoder walks every float of the tensor.
+    with stage_timer("crop", "postprocess"):
+        return json.dumps({**header, "probabilities": dict(zip(header["labels"], probs.round(decimals).tolist()))}, separators=(",", ":"))
+
+
+@app.post("/predictCrop/sweep")
+async def predict_sweep(
+    data: CropSweepInput,
+    response_format: Literal["json", "ndjson"] = Query("json", alias="format", description="One probability tensor, or NDJSON chunks"),
+    decimals: int = Query(4, ge=1, le=8, description="Decimals kept in the probabilities"),
+):
+    try:
+        axes = [(axis.feature, axis.to_values()) for axis in data.axes]
+        shape = [len(values) for _, values in axes]
+        n_points = int(np.prod(shape))
+        limit = CROP_SWEEP_MAX_JSON_POINTS if response_format == "json" else CROP_SWEEP_MAX_POINTS
+        if n_points > limit:
+            hint = ", use format=ndjson" if response_format == "json" and n_points <= CROP_SWEEP_MAX_POINTS else ""
+            raise ValueError(f"The sweep has {n_points} points, more than the {limit} allowed{hint}.")
+
+        crop_engine, label_encoder = await model_registry.aget("crop")
+        labels, label_indices = crop_sweep_label_indices(label_encoder, data.labels)
+        base_row = data.base.to_list()
+        header = {"axes": [{"feature": feature, "values": values} for feature, values in axes], "shape": shape, "labels": labels}
+
+        if response_format == "json":
+            with track_inference("crop_sweep"):
+                body = await inference_executor.run("crop", _sweep_json, header, base_row, axes, crop_engine, label_indices, decimals)
+            return Response(content=body, media_type="application/json")
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One line with the axes, then one per chunk of points in C order (last axis fastest),
+    # so only a chunk of the grid is ever held in memory.
+    async def generate_lines():
+        yield json.dumps(header) + "\n"
+        try:
+            with track_inference("crop_sweep"):
+                for start in range(0, n_points, CROP_SWEEP_CHUNK_SIZE):
+                    stop = min(start + CROP_SWEEP_CHUNK_SIZE, n_points)
+                    probs = await inference_executor.run("crop", crop_sweep_chunk, base_row, axes, start, stop, crop_engine, label_indices)
+                    chunk = {"start": start, "stop": stop, "probabilities": dict(zip(labels, probs.round(decimals).tolist()))}
+                    yield json.dumps(chunk, separators=(",", ":")) + "\n"
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
 @app.post("/predictSoil")
 async def predict_soil(file: UploadFile = File(...)):
     try:
-        image = Image.open(file.file).convert("RGB")
-        result = soil_type_prediction(image, soil_detection_model)
+        with track_inference("soil"):
+            image_tensor = await inference_executor.run("soil", lambda: soil_image_to_tensor(decode_soil_image(file.file)))
+            result = await soil_batcher.submit_async(image_tensor)
         return result
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()  # Optional, logs full traceback in backend
         raise HTTPException(status_code=500, detail="Prediction failed. Please try again.")
 
 
+@app.post("/detect-weeds/video")
+async def detect_weeds_video(
+    file: Optional[UploadFile] = File(None, description="Video file"),
+    frames: Optional[List[UploadFile]] = File(None, description="Frame images, in order"),
+    fps: float = Query(30.0, gt=0, le=240, description="Frame rate of a frame sequence (videos use their own)"),
+    every: int = Query(5, ge=1, le=300, description="Run YOLO on every Nth frame and track boxes in between"),
+    scene_threshold: float = Query(8.0, ge=0, le=255, description="Mean grayscale change from the previous frame that forces a detection, 0 to disable"),
+    imgsz: int = Query(640, ge=32, le=4096, description="YOLO inference size"),
+    conf: float = Query(0.25, ge=0.0, le=1.0, description="Minimum detection confidence"),
+    max_det: int = Query(300, ge=1, le=3000, description="Maximum number of detections per frame"),
+    max_frames: Optional[int] = Query(None, ge=1, description="Stop after this many frames"),
+):
+    video_path = None
+    try:
+        if (file is None) == (frames is None):
+            raise ValueError("Upload either a video as `file` or frame images as `frames`.")
+        weed_detector = await model_registry.aget("weeds")
+        if file is not None:
+            video_path = await asyncio.to_thread(spool_upload, file.file, file.filename, "weeds-video-")
+            info = video_info(video_path)
+            fps = info["fps"] or fps
+            frame_iter = iter_video_frames(video_path)
+        else:
+            info = {"fps": fps, "frames": len(frames)}
+            frame_iter = iter_image_frames((frame.filename, frame.file) for frame in frames)
+    except Exception as e:
+        if video_path is not None:
+            os.remove(video_path)
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The header announces the frames that will be processed, not the ones uploaded.
+    n_expected = info["frames"]
+    if max_frames is not None and n_expected is not None:
+        n_expected = min(n_expected, max_frames)
+
+    tracker = WeedTracker()
+    steps = track_weeds(
+        itertools.islice(frame_iter, max_frames), weed_detector, fps=fps, every=every,
+        scene_threshold=scene_threshold, imgsz=imgsz, conf=conf, max_det=max_det, tracker=tracker,
+    )
+
+    # A header line, one line per frame as it is processed, then a summary. Each frame is decoded
+    # and, if due, detected on the inference pool; only the current frame is held in memory.
+    async def generate_lines():
+        yield json.dumps({"fps": fps, "frames": n_expected}) + "\n"
+        n_frames, n_detected = 0, 0
+        start = time.perf_counter()
+        try:
+            with track_inference("weeds_video"):
+                while (step := await inference_executor.run("weeds", next, steps, None)) is not None:
+                    n_frames += 1
+                    n_detected += step["detected"]
+                    yield json.dumps(step) + "\n"
+            elapsed = time.perf_counter() - start
+            yield json.dumps({
+                "done": True, "frames": n_frames, "detected_frames": n_detected, "tracks": tracker.total_tracks,
+                "processing_seconds": round(elapsed, 3), "realtime_factor": round(n_frames / fps / elapsed, 2) if elapsed else None,
+            }) + "\n"
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            try:
+                steps.close()
+            except ValueError:
+                pass  # Still running on the pool after a client disconnect, it is closed once collected.
+            if video_path is not None:
+                os.remove(video_path)
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
+def _detect_orthomosaic(path, weed_detector, response_format, overview_size, **options):
+    # Opened, scanned and closed on one pool thread: GDAL settings are per thread.
+    with Orthomosaic(path) as mosaic:
+        result = detect_weeds_tiled(mosaic, weed_detector, **options)
+        if response_format == "image":
+            return render_overview(mosaic, result["detections"], overview_size)
+        return result
+
+
+@app.post("/detect-weeds/orthomosaic")
+async def detect_weeds_orthomosaic(
+    file: UploadFile = File(..., description="Orthomosaic (GeoTIFF or any raster GDAL reads)"),
+    response_format: Literal["json", "ndjson", "image"] = Query("json", alias="format", description="Detections as JSON/NDJSON, or a downsampled overview with the detections drawn"),
+    tile: int = Query(640, ge=128, le=4096, description="Tile size in pixels, also the YOLO inference size"),
+    overlap: int = Query(128, ge=0, le=2048, description="Overlap between neighbouring tiles in pixels"),
+    batch_size: int = Query(8, ge=1, le=64, description="Tiles per forward pass"),
+    conf: float = Query(0.25, ge=0.0, le=1.0, description="Minimum detection confidence"),
+    max_det: int = Query(300, ge=1, le=3000, description="Maximum number of detections per tile"),
+    overview_size: int = Query(2048, ge=256, le=8192, description="Longer side of the overview image"),
+):
+    path = None
+    try:
+        weed_detector = await model_registry.aget("weeds")
+        path = await asyncio.to_thread(spool_upload, file.file, file.filename, "orthomosaic-")
+        with track_inference("weeds_orthomosaic"):
+            result = await inference_executor.run(
+                "weeds", _detect_orthomosaic, path, weed_detector, response_format, overview_size,
+                tile=tile, overlap=overlap, batch_size=batch_size, conf=conf, max_det=max_det,
+            )
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if path is not None:
+            os.remove(path)
+
+    if response_format == "image":
+        return Response(content=result, media_type="image/jpeg")
+    if response_format == "json":
+        return result
+    lines = (json.dumps(detection) + "\n" for detection in result["detections"])
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+## Bulk soil classification: images are decoded and scored SOIL_BULK_BATCH_SIZE at a time.
+SOIL_BULK_BATCH_SIZE = int(os.getenv("SOIL_BULK_BATCH_SIZE", "16"))
+SOIL_BULK_MAX_IMAGES = int(os.getenv("SOIL_BULK_MAX_IMAGES", "5000"))
+SOIL_BULK_MAX_IMAGE_BYTES = int(os.getenv("SOIL_BULK_MAX_IMAGE_BYTES", str(50 * 1024 * 1024)))
+
+
+@app.post("/predictSoil/bulk")
+async def predict_soil_bulk(
+    files: Optional[List[UploadFile]] = File(None, description="Soil photos"),
+    archive: Optional[UploadFile] = File(None, description="Zip archive of soil photos"),
+):
+    try:
+        if files is None and archive is None:
+            raise ValueError("Upload soil photos as `files` or a zip archive as `archive`.")
+        # Uploads are spooled to temporary files, and zip members are opened one at a time.
+        items = [(file.filename, lambda file=file: file.file) for file in files or []]
+        if archive is not None:
+            # Opening the archive reads its central directory from the spooled upload: disk I/O, off the loop.
+            zip_archive = await asyncio.to_thread(zipfile.ZipFile, archive.file)
+            items = itertools.chain(items, iter_soil_archive(zip_archive, SOIL_BULK_MAX_IMAGE_BYTES))
+        # Anything past SOIL_BULK_MAX_IMAGES is left in `uploaded` and reported as truncated.
+        uploaded = iter(items)
+        items = itertools.islice(uploaded, SOIL_BULK_MAX_IMAGES)
+        soil_type_model = await model_registry.aget("soil")
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def next_chunk():
+        chunk = list(itertools.islice(items, SOIL_BULK_BATCH_SIZE))
+        return asyncio.ensure_future(inference_executor.run("soil", decode_soil_images, chunk)) if chunk else None
+
+    # One line per image, in upload order, as soon as its chunk is scored. The next chunk is
+    # decoded while the current one runs through the model.
+    async def generate_lines():
+        index, errors = 0, 0
+        decoding = next_chunk()
+        try:
+            with track_inference("soil_bulk"):
+                while decoding is not None:
+                    decoded = await decoding
+                    decoding = next_chunk()
+                    tensors = [tensor for _, tensor in decoded if not isinstance(tensor, Exception)]
+                    predictions = iter(await inference_executor.run("soil", soil_type_batch_prediction, tensors, soil_type_model) if tensors else [])
+                    for name, tensor in decoded:
+                        if isinstance(tensor, Exception):
+                            errors += 1
+                            line = {"index": index, "name": name, "error": str(tensor)}
+                        else:
+                            line = {"index": index, "name": name, "prediction": next(predictions)}
+                        index += 1
+                        yield json.dumps(line) + "\n"
+            truncated = next(uploaded, None) is not None
+            yield json.dumps({"done": True, "images": index, "errors": errors, "truncated": truncated, "max_images": SOIL_BULK_MAX_IMAGES}) + "\n"
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            if decoding is not None:
+                decoding.cancel()
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/batcherStats")
+def batcher_stats():
+    return [batcher.stats() for batcher in (soil_batcher, crop_batcher) if batcher is not None]
+
+
+@app.get("/cacheStats")
+def cache_stats():
+    return [cache.stats() for cache in (historic_response_cache, historic_plan_cache) if cache is not None]
+
+
+@app.get("/executorStats")
+def executor_stats():
+    return inference_executor.stats()
+
+
+@app.get("/historicData")
+def historic_data(
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    crop: Optional[str] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    group_by: str = Query("year", description=f"Comma-separated subset of {list(GROUP_BY_COLUMNS)}, or empty for one total"),
+):
+    group_by = tuple(filter(None, (name.strip() for name in group_by.split(","))))
+    unknown = [name for name in group_by if name not in GROUP_BY_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by {unknown}, expected any of {list(GROUP_BY_COLUMNS)}.")
+    try:
+        return model_registry.get("historic_store").query(state=state, district=district, crop=crop, year_from=year_from, year_to=year_to, group_by=group_by)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
 @app.post("/chatHistoricModel")
 async def chat_with_historic_data_model(text: str = Form(...)):
 
-    async def generate_response():
+    # A plain generator: StreamingResponse iterates it in a worker thread, off the event loop.
+    def generate_response():
         try:
-            # simulate streaming (you should modify query_historic_data_llm to yield tokens or chunks)
-            for chunk in query_historic_data_llm(agent_executor,llm_gemini, text):
+            agent_executor = model_registry.get("historic_agent")
+            for chunk in query_historic_data_llm(agent_executor, model_registry.get("gemini"), text, cache=historic_response_cache, plan_cache=historic_plan_cache):
                 yield chunk
         except Exception as e:
             import traceback
@@ -80,19 +513,27 @@ async def chat_with_chat_model(
 ):
 
     config = {'configurable': {'thread_id': thread_id}}
-    base64_image = None
-    
+    image_ref = None
+
     if image:
         image_bytes = await image.read()
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        # Normalize once and keep only a content-hash reference in the graph state.
+        try:
+            image_ref = await inference_executor.run("image", image_store.put, image_bytes)
+        except InferenceBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=400, detail="Could not read the uploaded image.")
 
     async def generate_response():
         try:
-            if base64_image:
-                for chunk in chat_with_llm(config, query, imageUploaded=True, base64_image=base64_image):
+            if image_ref:
+                async for chunk in chat_with_llm(config, query, imageUploaded=True, image_ref=image_ref):
                     yield chunk
             else:
-                for chunk in chat_with_llm(config, query):
+                async for chunk in chat_with_llm(config, query):
                     yield chunk
 
         except Exception as e:
@@ -104,12 +545,36 @@ async def chat_with_chat_model(
         
 
 @app.post("/detect-weeds")
-async def detect_weeds(file: UploadFile = File(...)):
+async def detect_weeds(
+    file: UploadFile = File(...),
+    response_format: Literal["image", "json", "ndjson"] = Query("image", alias="format", description="Rendered image, or detections as JSON/NDJSON"),
+    imgsz: int = Query(640, ge=32, le=4096, description="YOLO inference size"),
+    conf: float = Query(0.25, ge=0.0, le=1.0, description="Minimum detection confidence"),
+    max_det: int = Query(300, ge=1, le=3000, description="Maximum number of detections"),
+    image_format: Literal["jpeg", "webp"] = Query("jpeg", description="Encoding of the rendered image"),
+    quality: int = Query(95, ge=1, le=100, description="JPEG/WebP quality of the rendered image"),
+):
     try:
         image_bytes = await file.read()
-        result_image_bytes = detect_weeds_from_image(image_bytes,weed_detector)
-        return StreamingResponse(BytesIO(result_image_bytes), media_type="image/jpeg")
+        weed_detector = await model_registry.aget("weeds")
+        with track_inference("weeds"):
+            if response_format == "image":
+                result_image_bytes = await inference_executor.run(
+                    "weeds", detect_weeds_from_image, image_bytes, weed_detector,
+                    imgsz=imgsz, conf=conf, max_det=max_det, image_format=image_format, quality=quality,
+                )
+                return StreamingResponse(BytesIO(result_image_bytes), media_type=WEED_IMAGE_ENCODINGS[image_format][2])
+
+            result = await inference_executor.run(
+                "weeds", detect_weeds_as_json, image_bytes, weed_detector, imgsz=imgsz, conf=conf, max_det=max_det,
+            )
+        if response_format == "json":
+            return result
+        lines = (json.dumps(detection) + "\n" for detection in result["detections"])
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+    except InferenceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return {"error": "Weed detection failed. Please try again."}
\ No newline at end of file
+        return {"error": "Weed detection failed. Please try again."}
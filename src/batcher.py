@@ -0,0 +1,131 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+
+from src.executor import InferenceBusyError
+
+
+QUEUE_DEPTH_BUCKETS = [0, 1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests into one batch and runs `batch_fn` once per batch.
+
+    `batch_fn` receives a list of inputs and must return a list of outputs in the same order.
+    A batch is dispatched as soon as `max_batch_size` items are waiting or `max_wait_ms` has
+    passed since the first item of the batch arrived, whichever happens first.
+
+    At most `max_queue` items may wait for a batch (0 means unbounded); further submissions
+    raise `InferenceBusyError` so endpoints shed load the same way the inference executor does.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=10, name="batcher", max_queue=0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.max_queue = max_queue
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._batch_size_hist = [0] * (max_batch_size + 1)
+        self._queue_depth_hist = [0] * (len(QUEUE_DEPTH_BUCKETS) + 1)
+        self._items = 0
+        self._batches = 0
+        self._wait_seconds = 0.0
+        self._worker_pid = None
+
+    def _ensure_worker(self):
+        # Started on first use rather than in __init__: a worker forked from a preloading parent
+        # does not inherit the parent's threads and needs its own.
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+                self._worker.start()
+                self._worker_pid = os.getpid()
+
+    def submit(self, item) -> Future:
+        """Queues a single item and returns a future resolved with its output."""
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            raise InferenceBusyError(f"Too many queued '{self.name}' requests, please retry shortly.") from None
+        return future
+
+    async def submit_async(self, item):
+        """Awaitable wrapper around `submit` for async endpoints."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._record(batch)
+
+            items = [item for item, _, _ in batch]
+            try:
+                outputs = self.batch_fn(items)
+                if len(outputs) != len(items):
+                    raise RuntimeError(f"{self.name}: batch_fn returned {len(outputs)} outputs for {len(items)} inputs")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        depth = self._queue.qsize()
+        with self._lock:
+            self._batch_size_hist[len(batch)] += 1
+            self._queue_depth_hist[bisect_left(QUEUE_DEPTH_BUCKETS, depth)] += 1
+            self._items += len(batch)
+            self._batches += 1
+            self._wait_seconds += sum(now - queued_at for _, _, queued_at in batch)
+
+    def stats(self):
+        """Returns batch-size and queue-depth histograms for tuning `max_batch_size`/`max_wait_ms`."""
+        with self._lock:
+            depth_labels = [f"<={bound}" for bound in QUEUE_DEPTH_BUCKETS] + [f">{QUEUE_DEPTH_BUCKETS[-1]}"]
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_queue": self.max_queue,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "mean_queue_wait_ms": 1000 * self._wait_seconds / self._items if self._items else 0.0,
+                "queue_depth": self._queue.qsize(),
+                "batch_size_histogram": {
+                    str(size): count for size, count in enumerate(self._batch_size_hist) if size > 0
+                },
+                "queue_depth_histogram": dict(zip(depth_labels, self._queue_depth_hist)),
+            }
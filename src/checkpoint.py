@@ -0,0 +1,231 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-process checkpointer with bounded memory.
+
+    Keeps at most `max_history` checkpoints per thread and namespace, and evicts whole threads that
+    have been idle longer than `ttl_seconds` or that fall outside the `max_threads` most recently used.
+    """
+
+    def __init__(self, max_threads=10000, ttl_seconds=7 * 24 * 3600, max_history=3):
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_history = max_history
+
+        self._lock = threading.RLock()
+        self._last_access = OrderedDict()
+        # (thread_id, checkpoint_ns) -> deque of (checkpoint_id, channel_versions), oldest first.
+        self._history = defaultdict(deque)
+
+    def get_tuple(self, config):
+        self._touch(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+
+            history = self._history[(thread_id, checkpoint_ns)]
+            history.append((checkpoint["id"], dict(checkpoint["channel_versions"])))
+            while len(history) > self.max_history:
+                self._drop_checkpoint(thread_id, checkpoint_ns, *history.popleft(), history)
+
+            self._touch(thread_id)
+            self._evict()
+            return next_config
+
+    def _drop_checkpoint(self, thread_id, checkpoint_ns, checkpoint_id, channel_versions, kept):
+        self.storage[thread_id][checkpoint_ns].pop(checkpoint_id, None)
+        self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        # Channel values are stored once per version; only drop the ones no kept checkpoint still points at.
+        still_used = {(channel, version) for _, versions in kept for channel, version in versions.items()}
+        for channel, version in channel_versions.items():
+            if (channel, version) not in still_used:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+
+    def _touch(self, thread_id):
+        with self._lock:
+            self._last_access[thread_id] = time.monotonic()
+            self._last_access.move_to_end(thread_id)
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._last_access:
+            thread_id, accessed_at = next(iter(self._last_access.items()))
+            if len(self._last_access) <= self.max_threads and accessed_at >= cutoff:
+                break
+            self.delete_thread(thread_id)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._last_access.pop(thread_id, None)
+            for key in [key for key in self._history if key[0] == thread_id]:
+                del self._history[key]
+
+
+class BoundedSqliteSaver(SqliteSaver):
+    """
+    SQLite-backed checkpointer, so conversations survive restarts and any worker can resume them.
+
+    Applies the same bounds as BoundedMemorySaver: `max_history` checkpoints per thread and namespace,
+    and idle/LRU eviction of whole threads, checked at most once every `evict_interval` seconds.
+    The async methods the graphs use run the sync ones on a worker thread, off the event loop;
+    the connection is already shared between threads behind `self.lock`.
+
+    `acquire_thread_lock`/`release_thread_lock` give every worker sharing the file one lease per
+    conversation thread, so turns on the same thread are serialized across processes.
+    """
+
+    def __init__(self, conn, max_threads=10000, ttl_seconds=7 * 24 * 3600, max_history=3, evict_interval=60):
+        super().__init__(conn)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_history = max_history
+        self.evict_interval = evict_interval
+        self._last_eviction = 0.0
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        saver = cls(sqlite3.connect(path, check_same_thread=False), **kwargs)
+        # A SQLite connection must not be used across fork(); forked workers open their own.
+        os.register_at_fork(after_in_child=lambda: saver._reconnect(path))
+        return saver
+
+    def _reconnect(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def setup(self):
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_activity (
+                thread_id TEXT PRIMARY KEY,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thread_activity_accessed_at ON thread_activity (accessed_at);
+            CREATE TABLE IF NOT EXISTS thread_locks (
+                thread_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+
+    def acquire_thread_lock(self, thread_id, owner, lease_seconds):
+        """Takes the lease on `thread_id` unless another owner holds an unexpired one. Returns True on success."""
+        now = time.time()
+        with self.cursor() as cur:
+            # A single upsert is atomic across processes; an expired lease (crashed worker) is taken over.
+            cur.execute(
+                "INSERT INTO thread_locks (thread_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE thread_locks.expires_at < ?",
+                (str(thread_id), owner, now + lease_seconds, now),
+            )
+            return cur.rowcount == 1
+
+    def release_thread_lock(self, thread_id, owner):
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_locks WHERE thread_id = ? AND owner = ?", (str(thread_id), owner))
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+
+        with self.cursor() as cur:
+            # Checkpoint ids are time-ordered, so the newest `max_history` sort last.
+            cur.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT ?)",
+                (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_history),
+            )
+            cur.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN ("
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+            )
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, accessed_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+
+        if time.monotonic() - self._last_eviction >= self.evict_interval:
+            self._last_eviction = time.monotonic()
+            self._evict()
+        return next_config
+
+    def _evict(self):
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT thread_id FROM thread_activity WHERE accessed_at < ? UNION "
+                "SELECT thread_id FROM (SELECT thread_id FROM thread_activity ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (time.time() - self.ttl_seconds, self.max_threads),
+            )
+            stale = [(thread_id,) for thread_id, in cur.fetchall()]
+            cur.executemany("DELETE FROM checkpoints WHERE thread_id = ?", stale)
+            cur.executemany("DELETE FROM writes WHERE thread_id = ?", stale)
+            cur.executemany("DELETE FROM thread_activity WHERE thread_id = ?", stale)
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        return await asyncio.to_thread(self.get_delta_channel_history, config=config, channels=channels)
+
+
+def load_checkpointer():
+    """
+    Builds the chat checkpointer selected by CHECKPOINT_BACKEND ('memory' or 'sqlite'), bounded by
+    CHECKPOINT_MAX_THREADS, CHECKPOINT_TTL_SECONDS and CHECKPOINT_MAX_HISTORY.
+    """
+    backend = os.getenv("CHECKPOINT_BACKEND", "memory")
+    bounds = {
+        "max_threads": int(os.getenv("CHECKPOINT_MAX_THREADS", "10000")),
+        "ttl_seconds": float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600))),
+        "max_history": int(os.getenv("CHECKPOINT_MAX_HISTORY", "3")),
+    }
+    if backend == "memory":
+        return BoundedMemorySaver(**bounds)
+    if backend == "sqlite":
+        return BoundedSqliteSaver.from_path(os.getenv("CHECKPOINT_PATH", "./cache/checkpoints.sqlite3"), **bounds)
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND '{backend}', expected 'memory' or 'sqlite'.")
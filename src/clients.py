@@ -0,0 +1,118 @@
+import os
+import threading
+
+import httpx
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+from groq import AsyncGroq, Groq
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from src.credentials import creds
+
+load_dotenv()
+
+
+class ClientRegistry:
+    """
+    Long-lived, shared LLM provider clients.
+
+    Every client is created once on first use and then reused, so requests share one keep-alive
+    connection pool per provider instead of paying a TLS handshake each call. All of these clients
+    are safe to share between threads. Base URLs can be overridden to point at a local stand-in server.
+    """
+
+    def __init__(self, timeout=None, max_retries=None, max_connections=None, groq_base_url=None, gemini_base_url=None):
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.max_connections = max_connections or int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "32"))
+        self.groq_base_url = groq_base_url or os.getenv("GROQ_BASE_URL")
+        self.gemini_base_url = gemini_base_url or os.getenv("GEMINI_BASE_URL")
+
+        self._clients = {}
+        self._lock = threading.Lock()
+        # Connection pools and gRPC channels do not survive fork(); forked workers build their own clients.
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+
+    def _limits(self):
+        return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+
+    def groq(self) -> Groq:
+        return self._get("groq", lambda: Groq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=self.groq_base_url,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            http_client=httpx.Client(limits=self._limits(), timeout=self.timeout),
+        ))
+
+    def groq_async(self) -> AsyncGroq:
+        return self._get("groq_async", lambda: AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            base_url=self.groq_base_url,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            http_client=httpx.AsyncClient(limits=self._limits(), timeout=self.timeout),
+        ))
+
+    def genai(self) -> genai.Client:
+        """google-genai client. Its async variant is `registry.genai().aio`, which shares the same configuration."""
+        return self._get("genai", lambda: genai.Client(
+            credentials=creds,
+            http_options=types.HttpOptions(base_url=self.gemini_base_url, timeout=int(self.timeout * 1000)),
+        ))
+
+    def chat_gemini(self) -> ChatGoogleGenerativeAI:
+        """LangChain Gemini chat model, with both sync (`invoke`/`stream`) and async (`ainvoke`/`astream`) methods."""
+        return self._get("chat_gemini", lambda: ChatGoogleGenerativeAI(
+            api_key=os.getenv("GOOGLE_API_KEY"),
+            model="gemini-2.0-flash",
+            credentials=creds,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            client_options={"api_endpoint": self.gemini_base_url} if self.gemini_base_url else None,
+        ))
+
+
+clients = ClientRegistry()
+
+
+def measure_connection_reuse(url, requests=50):
+    """
+    Times `requests` GETs against `url` with a fresh httpx client per call (the old behaviour)
+    and with one pooled client. Returns the mean milliseconds per request for each.
+    """
+    import time
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        with httpx.Client() as client:
+            client.get(url)
+    fresh_ms = (time.perf_counter() - start) * 1000 / requests
+
+    start = time.perf_counter()
+    with httpx.Client(limits=httpx.Limits(max_keepalive_connections=1)) as client:
+        for _ in range(requests):
+            client.get(url)
+    pooled_ms = (time.perf_counter() - start) * 1000 / requests
+
+    return {"fresh_client_ms": fresh_ms, "pooled_client_ms": pooled_ms}
+
+
+if __name__ == "__main__":
+    import sys
+    # Point at the real provider or a local stand-in, e.g. python -m src.clients https://generativelanguage.googleapis.com
+    print(measure_connection_reuse(sys.argv[1] if len(sys.argv) > 1 else "https://api.groq.com"))
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+
+CROP_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+class TorchCropEngine:
+    """Reference path: sklearn preprocessor on a DataFrame, then the eager TabularNet."""
+
+    def __init__(self, model, preprocessor):
+        self.model = model.eval()
+        self.preprocessor = preprocessor
+
+    def predict_proba(self, input_matrix):
+        processed_input = self.preprocessor.transform(pd.DataFrame(input_matrix, columns=CROP_FEATURES))
+        with torch.no_grad():
+            logits = self.model(torch.as_tensor(processed_input, dtype=torch.float32))
+            return torch.softmax(logits, dim=1).numpy()
+
+
+class FoldedCropEngine:
+    """
+    Pandas- and sklearn-free inference path for TabularNet.
+
+    The median imputer is kept as a NaN fill, the StandardScaler is folded into the first
+    Linear layer and every eval-mode BatchNorm1d is folded into the Linear before it, so a
+    prediction is a handful of small NumPy matmuls.
+    """
+
+    def __init__(self, model, preprocessor):
+        imputer = preprocessor.named_steps.get("imputer")
+        scaler = preprocessor.named_steps.get("scaler")
+        if imputer is None or scaler is None or len(preprocessor.steps) != 2:
+            raise ValueError("FoldedCropEngine expects an imputer -> scaler preprocessing pipeline.")
+
+        self.fill_values = np.asarray(imputer.statistics_, dtype=np.float64)
+        self.layers = self._fold_layers(model.eval(), scaler)
+
+    @staticmethod
+    def _fold_layers(model, scaler):
+        layers = []
+        for module in model.net:
+            if isinstance(module, nn.Linear):
+                weight = module.weight.detach().double().numpy().copy()
+                bias = module.bias.detach().double().numpy().copy()
+                layers.append([weight, bias, False])
+            elif isinstance(module, nn.BatchNorm1d):
+                weight, bias, _ = layers[-1]
+                gamma = module.weight.detach().double().numpy()
+                beta = module.bias.detach().double().numpy()
+                mean = module.running_mean.double().numpy()
+                std = np.sqrt(module.running_var.double().numpy() + module.eps)
+                factor = gamma / std
+                layers[-1][0] = weight * factor[:, None]
+                layers[-1][1] = (bias - mean) * factor + beta
+            elif isinstance(module, nn.ReLU):
+                layers[-1][2] = True
+            elif not isinstance(module, nn.Dropout):
+                raise ValueError(f"Cannot fold layer {module!r}.")
+
+        # (x - mean) / scale followed by W x + b  ==  (W / scale) x + (b - (W / scale) @ mean)
+        weight, bias, _ = layers[0]
+        n_features = weight.shape[1]
+        mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else np.zeros(n_features)
+        scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else np.ones(n_features)
+        layers[0][0] = weight / scale
+        layers[0][1] = bias - layers[0][0] @ mean
+
+        # Store transposed so the forward pass is x @ W.T without a per-call transpose.
+        return [(np.ascontiguousarray(weight.T), bias, relu) for weight, bias, relu in layers]
+
+    def predict_proba(self, input_matrix):
+        x = np.array(input_matrix, dtype=np.float64, ndmin=2)
+        missing = np.isnan(x)
+        if missing.any():
+            x = np.where(missing, self.fill_values, x)
+
+        for weight_t, bias, relu in self.layers:
+            x = x @ weight_t
+            x += bias
+            if relu:
+                np.maximum(x, 0, out=x)
+        return _softmax(x)
+
+
+CROP_ENGINES = {
+    "torch": TorchCropEngine,
+    "numpy": FoldedCropEngine,
+}
+
+
+def check_parity(reference_engine, candidate_engine, n_rows=10000, atol=1e-5, seed=0):
+    """
+    Scores random soil-test rows, spanning and exceeding the training ranges, with both
+    engines and returns the max absolute probability difference and top-1 agreement.
+    """
+    rng = np.random.default_rng(seed)
+    low = np.array([0, 0, 0, 5, 10, 3, 20], dtype=np.float64)
+    high = np.array([150, 150, 210, 45, 100, 10, 300], dtype=np.float64)
+    input_matrix = rng.uniform(low, high, size=(n_rows, len(CROP_FEATURES)))
+
+    reference = reference_engine.predict_proba(input_matrix)
+    candidate = candidate_engine.predict_proba(input_matrix)
+    max_abs_diff = float(np.abs(reference - candidate).max())
+    top1_agreement = float((reference.argmax(axis=1) == candidate.argmax(axis=1)).mean())
+    return {"max_abs_diff": max_abs_diff, "top1_agreement": top1_agreement, "passed": max_abs_diff <= atol}
+
+
+if __name__ == "__main__":
+    import time
+    from src.model_arch import load_crop_recommendation_model
+
+    model, _, preprocessor = load_crop_recommendation_model()
+    torch_engine = TorchCropEngine(model, preprocessor)
+    numpy_engine = FoldedCropEngine(model, preprocessor)
+    print("Parity (torch vs numpy):", check_parity(torch_engine, numpy_engine))
+
+    row = [[90, 42, 43, 20.88, 82.0, 6.5, 202.94]]
+    for name, engine in (("torch", torch_engine), ("numpy", numpy_engine)):
+        start = time.perf_counter()
+        for _ in range(1000):
+            engine.predict_proba(row)
+        print(f"{name}: {(time.perf_counter() - start) * 1000:.1f} us per prediction")
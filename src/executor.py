@@ -0,0 +1,89 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import cv2
+import torch
+
+
+class InferenceBusyError(RuntimeError):
+    """Raised when a model already has its maximum number of requests running and queued."""
+
+
+def parse_model_limits(spec):
+    """Parses 'soil=4,weeds=1' into {'soil': 4, 'weeds': 1}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, limit = item.partition("=")
+        limits[model.strip()] = int(limit)
+    return limits
+
+
+class InferenceExecutor:
+    """
+    Dedicated thread pool for CPU-bound model calls, so async endpoints never run inference on the event loop.
+
+    Each model gets a concurrency limit (how many of its calls may run at once) and a queue limit
+    (how many more may wait). Requests beyond that are rejected with InferenceBusyError instead of
+    piling up, which keeps inference from starving I/O-bound endpoints.
+    """
+
+    def __init__(self, max_workers=None, torch_threads=None, model_limits=None, default_limit=2, max_queue=16):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.model_limits = model_limits or {}
+
+        # Workers share the cores: bound intra-op threads so concurrent calls do not oversubscribe the CPU.
+        torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.max_workers)
+        torch.set_num_threads(torch_threads)
+        cv2.setNumThreads(torch_threads)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._semaphores = {}
+        self._pending = {}
+
+    def _limit(self, model):
+        return self.model_limits.get(model, self.default_limit)
+
+    async def run(self, model, fn, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` on the pool under `model`'s concurrency and queue limits."""
+        limit = self._limit(model)
+        pending = self._pending.get(model, 0)
+        if pending >= limit + self.max_queue:
+            raise InferenceBusyError(f"Too many pending '{model}' requests, please retry shortly.")
+
+        semaphore = self._semaphores.setdefault(model, asyncio.Semaphore(limit))
+        self._pending[model] = pending + 1
+        try:
+            async with semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+        finally:
+            self._pending[model] -= 1
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "torch_threads": torch.get_num_threads(),
+            "models": {
+                model: {"limit": self._limit(model), "pending": pending}
+                for model, pending in self._pending.items()
+            },
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def load_inference_executor():
+    workers = os.getenv("INFERENCE_WORKERS")
+    torch_threads = os.getenv("INFERENCE_TORCH_THREADS")
+    return InferenceExecutor(
+        max_workers=int(workers) if workers else None,
+        torch_threads=int(torch_threads) if torch_threads else None,
+        model_limits=parse_model_limits(os.getenv("INFERENCE_MODEL_LIMITS", "crop=4,soil=2,weeds=1")),
+        default_limit=int(os.getenv("INFERENCE_DEFAULT_LIMIT", "2")),
+        max_queue=int(os.getenv("INFERENCE_MAX_QUEUE", "16")),
+    )
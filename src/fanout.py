@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+
+from src.metrics import VISION_BRANCH_SECONDS, logger
+
+
+FANOUT_POLICIES = ("all", "first", "best_within")
+
+
+async def run_fanout(branches, policy="all", timeout=30.0, best_within=2.0):
+    """
+    Awaits every branch coroutine function concurrently and returns ({name: result}, {name: failure reason}).
+
+    - "all": wait for every branch, up to `timeout` seconds.
+    - "first": return as soon as one branch succeeds.
+    - "best_within": return whatever has succeeded after `best_within` seconds; if nothing has
+      succeeded by then, return on the first success.
+
+    A branch that raises or misses the `timeout` deadline is dropped, it never fails the whole call.
+    Branches still running when the call returns are cancelled, which closes their provider request.
+    """
+    if policy not in FANOUT_POLICIES:
+        raise ValueError(f"Unknown fan-out policy '{policy}', expected one of {FANOUT_POLICIES}.")
+
+    start = time.perf_counter()
+    deadline = start + timeout
+    soft_deadline = start + best_within if policy == "best_within" else deadline
+    tasks = {asyncio.ensure_future(_timed(name, fn)): name for name, fn in branches.items()}
+
+    results, failures = {}, {}
+    pending = set(tasks)
+    while pending:
+        # Until something succeeds, wait up to the hard deadline; after that, only up to the soft one.
+        until = soft_deadline if results else deadline
+        now = time.perf_counter()
+        if now >= until:
+            break
+        done, pending = await asyncio.wait(pending, timeout=until - now, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            name = tasks[task]
+            try:
+                results[name] = task.result()
+            except Exception as e:
+                failures[name] = f"error: {e}"
+                logger.warning("Vision branch %s failed: %s", name, e)
+        if results and policy == "first":
+            break
+
+    for task in pending:
+        name = tasks[task]
+        task.cancel()
+        failures[name] = "timeout" if time.perf_counter() >= deadline else "skipped"
+        VISION_BRANCH_SECONDS.labels(name, failures[name]).observe(time.perf_counter() - start)
+    return results, failures
+
+
+async def _timed(name, fn):
+    start = time.perf_counter()
+    try:
+        result = await fn()
+    except Exception:
+        VISION_BRANCH_SECONDS.labels(name, "error").observe(time.perf_counter() - start)
+        raise
+    VISION_BRANCH_SECONDS.labels(name, "ok").observe(time.perf_counter() - start)
+    return result
+
+
+def load_fanout_config():
+    return {
+        "policy": os.getenv("VISION_POLICY", "all"),
+        "timeout": float(os.getenv("VISION_BRANCH_TIMEOUT_SECONDS", "30")),
+        "best_within": float(os.getenv("VISION_BEST_WITHIN_MS", "3000")) / 1000,
+    }
+
+
+if __name__ == "__main__":
+    # Simulated providers: a fast-ish one with a slow tail, and a slower one that sometimes fails.
+    import logging
+    import random
+
+    logger.setLevel(logging.ERROR)
+
+    def provider(median, tail, tail_rate, fail_rate):
+        async def call():
+            delay = tail if random.random() < tail_rate else random.uniform(0.5, 1.5) * median
+            await asyncio.sleep(delay)
+            if random.random() < fail_rate:
+                raise RuntimeError("provider error")
+            return "ok"
+        return call
+
+    async def simulate(policy, requests=400):
+        latencies, answered = [], 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            results, _ = await run_fanout(branches, policy=policy, timeout=0.4, best_within=0.1)
+            latencies.append(time.perf_counter() - start)
+            answered += bool(results)
+        latencies.sort()
+        return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], answered / requests
+
+    branches = {"llama": provider(0.05, 0.5, 0.05, 0.02), "gemini": provider(0.08, 0.8, 0.05, 0.05)}
+    for policy in FANOUT_POLICIES:
+        p50, p99, answered = asyncio.run(simulate(policy))
+        print(f"{policy:12s} p50={p50 * 1000:6.1f}ms p99={p99 * 1000:6.1f}ms answered={answered * 100:.1f}%")
@@ -1,15 +1,15 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
-import os
+import asyncio
+from functools import partial
 from IPython.display import Image,display
 from langgraph.graph import START,END,StateGraph, MessagesState
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, RemoveMessage
-from groq import  Groq
-from google import genai
-import base64
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 from google.genai import types
-from src.credentials import creds
+from src.clients import clients
+from src.checkpoint import load_checkpointer
+from src.image_store import image_store
+from src.fanout import load_fanout_config, run_fanout
+from src.summarizer import load_summarizer
 
 from langgraph.graph.message import add_messages
 from typing import Literal
@@ -19,14 +19,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-llm_gemini = ChatGoogleGenerativeAI(api_key=os.getenv("GOOGLE_API_KEY"),
-                                model="gemini-2.0-flash",
-                                credentials=creds)
-
 
 class OverAllState(TypedDict):
     query: str
-    base64_image: str
+    image_ref: str
     llama_response: str
     gemini_response: str
     answer:str
@@ -54,10 +50,11 @@ analysis_results = """gemini_output: {gemini_response}, llama_output: {llama_res
 
 
 
-def process_image_llama(state: OverAllState):
-    client = Groq(api_key=os.getenv("GROQ_API_KEY")) 
+async def process_image_llama(state: OverAllState):
+    client = clients.groq_async()
     query = state["query"]
-    base64_image = state["base64_image"]
+    # The disk image store reads a file; keep that off the event loop.
+    base64_image = await asyncio.to_thread(image_store.get_base64, state["image_ref"])
 
 
     messages = [
@@ -78,7 +75,7 @@ def process_image_llama(state: OverAllState):
         }
     ]
 
-    chat_completion = client.chat.completions.create(
+    chat_completion = await client.chat.completions.create(
         messages=messages,
         model="llama-3.2-11b-vision-preview",
     )
@@ -91,16 +88,15 @@ def process_image_llama(state: OverAllState):
     
 
 
-def process_image_gemini(state: OverAllState):
+async def process_image_gemini(state: OverAllState):
     """Processes an image with Google Gemini Vision model."""
     query = state["query"]
-    base64_image = state["base64_image"]
-    # Decode base64 string to bytes
-    image_bytes = base64.b64decode(base64_image)
+    # Normalized JPEG bytes straight from the image store, no base64 round trip.
+    image_bytes = await asyncio.to_thread(image_store.get, state["image_ref"])
 
     # Call Gemini Vision API
-    client = genai.Client(credentials=creds)
-    response = client.models.generate_content(
+    client = clients.genai().aio
+    response = await client.models.generate_content(
         model="gemini-2.0-flash",
         contents=[
             f"{query}",
@@ -113,23 +109,43 @@ def process_image_gemini(state: OverAllState):
 
 
 
-def build_answer(state: OverAllState):
+VISION_BRANCHES = {
+    "llama_response": process_image_llama,
+    "gemini_response": process_image_gemini,
+}
 
 
-    llm_groq = ChatGroq(
-        model="llama-guard-3-8b",
-        temperature=0,
-        max_tokens=None,
-        api_key=os.getenv("GROQ_API_KEY")
-    )
+async def vision_branch(node, key, state):
+    return (await node(state))[key]
+
+
+async def process_image(state: OverAllState):
+    """Fans the image out to every vision model concurrently, under the configured deadline and completion policy."""
+    fanout_config = load_fanout_config()
+    branches = {key: partial(vision_branch, node, key, state) for key, node in VISION_BRANCHES.items()}
+    results, failures = await run_fanout(branches, **fanout_config)
+
+    if not results:
+        raise RuntimeError(f"All vision models failed: {failures}")
+
+    # With a single usable answer there is nothing to merge, so skip build_answer unless every branch was required.
+    if len(results) == 1 and fanout_config["policy"] != "all":
+        return {**results, "answer": next(iter(results.values()))}
+    return results
+
 
-    llm_gemini = ChatGoogleGenerativeAI(api_key=os.getenv("GOOGLE_API_KEY"),
-                            model="gemini-2.0-flash", credentials=creds)
+def route_answer(state: OverAllState):
+    """Skips build_answer when process_image already produced the final answer."""
+    if state.get("answer"):
+        return END
+    return "build answer"
 
-    # response = llm_groq.invoke(answer_writing_instruction.format(gemini_response=state["gemini_response"],
-    #                                                                llama_response= state["llama_response"]))
-    response = llm_gemini.invoke(answer_writing_system_message+[HumanMessage(content=analysis_results.format(gemini_response=state["gemini_response"],
-                                                                                                                llama_response= state["llama_response"]))])
+
+async def build_answer(state: OverAllState, config: RunnableConfig):
+
+    # Passing the node config on keeps the answer tokens on the graph's message stream on Python < 3.11.
+    response = await clients.chat_gemini().ainvoke(answer_writing_system_message+[HumanMessage(content=analysis_results.format(gemini_response=state.get("gemini_response", "unavailable"),
+                                                                                                                llama_response= state.get("llama_response", "unavailable")))], config)
 
     return {"answer":response.content}
 
@@ -141,20 +157,18 @@ def build_answer(state: OverAllState):
 # Build a simple graph with one node.
 builder = StateGraph(OverAllState)
 
-builder.add_node("process image llama", process_image_llama)
-builder.add_node("process image gemini",process_image_gemini)
+builder.add_node("process image", process_image)
 builder.add_node("build answer", build_answer)
 
 
-builder.add_edge(START, "process image llama")
-builder.add_edge(START, "process image gemini")
-builder.add_edge("process image llama", "build answer")
-builder.add_edge("process image gemini", "build answer")
+builder.add_edge(START, "process image")
+builder.add_conditional_edges("process image", route_answer, ["build answer", END])
 builder.add_edge("build answer", END)
 
 
-memory = MemorySaver()
-vision_graph = builder.compile(checkpointer=memory)
+# The vision sub-graph is stateless per request: checkpointer=False keeps it from writing any
+# checkpoints, even when it runs inside chat_graph's checkpointed "image model" node.
+vision_graph = builder.compile(checkpointer=False)
 vision_graph
 
 
@@ -185,11 +199,11 @@ class State(MessagesState):
     query:str
     summary: str
     isImageUploaded : Literal[True,False]
-    base64_image:str
+    image_ref:str
 
 
 
-def call_chat_model(state: State):
+async def call_chat_model(state: State, config: RunnableConfig):
     # Extract the human query (currently stored as a plain string)
     human_query = state.get("query")
     
@@ -207,7 +221,7 @@ def call_chat_model(state: State):
     
 
     # Now, call your LLM with these messages.
-    response = llm_gemini.invoke(farmer_bot+state.get("messages")+new_mmsg)
+    response = await clients.chat_gemini().ainvoke(farmer_bot+state.get("messages")+new_mmsg, config)
     
     # Wrap the LLM response as an AIMessage.
     ai_message = AIMessage(content=response.content)
@@ -219,7 +233,7 @@ def call_chat_model(state: State):
     return {"messages": updated_messages }
 
 
-def call_image_model(state:State):
+async def call_image_model(state:State, config: RunnableConfig):
     # """Deals with any kind of vision logic"""
 
     # Wrap the human input in a HumanMessage.
@@ -240,9 +254,9 @@ def call_image_model(state:State):
 
     user_query = f"User's current query: {state['query']}"
 
-    config = {'configurable': {'thread_id': '1'}}
-    vision_graph.invoke({"base64_image":state["base64_image"],"query": mmsg_history+user_query},config)
-    response = vision_graph.get_state(config).values["answer"]
+    # Forward the parent's callbacks so build_answer's tokens reach chat_graph's message stream (needed on Python < 3.11).
+    vision_config = {'callbacks': config.get('callbacks')}
+    response = (await vision_graph.ainvoke({"image_ref":state["image_ref"],"query": mmsg_history+user_query},vision_config))["answer"]
     
     # Wrap the LLM response as an AIMessage.
     ai_message = AIMessage(content=response)
@@ -255,26 +269,6 @@ def call_image_model(state:State):
     return {"messages": updated_messages }
 
 
-def summarize_convo(state:State):
-
-    summary = state.get("summary")
-
-    if summary:
-        summary_mmsg = {
-            f"This is the summary of the convo until now: {summary}.\n\n"
-            "Extend the summary by taking into account the new messages above."
-        }
-
-    else:
-        summary_mmsg = "Create a summary of the conversation above"
-
-    messages = state.get("messages") + [HumanMessage(content=summary_mmsg)]
-    response = llm_gemini.invoke(messages)
-
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
-    return {"summary": response.content, "messages": delete_messages}
-
-
 def handle_input(state:State):
     """Checks if image is the input"""
     if (state["isImageUploaded"]):
@@ -282,32 +276,21 @@ def handle_input(state:State):
     return "chat model"
 
 
-def should_trim(state:State):
-    """Returns the next node to be executed"""
-
-    messages = state.get("messages")
-
-    if len(messages)> 6:
-        return "summarize_convo"
-    
-    return END
-
-
-
 workflow = StateGraph(State)
 workflow.add_node("image model", call_image_model)  
 workflow.add_node("chat model",call_chat_model)
-workflow.add_node("summarize_convo", summarize_convo)
 
 
 
 workflow.add_conditional_edges(START, handle_input, ["chat model", "image model"])
-workflow.add_conditional_edges("chat model", should_trim, ["summarize_convo",END])
-workflow.add_conditional_edges("image model", should_trim, ["summarize_convo",END])
-workflow.add_edge("summarize_convo", END)
+# Summarization is not part of the turn: the summarizer runs it in the background once the answer has streamed.
+workflow.add_edge("chat model", END)
+workflow.add_edge("image model", END)
 
 
 
-memory = MemorySaver()
+memory = load_checkpointer()
 chat_graph = workflow.compile(checkpointer=memory)
-chat_graph
\ No newline at end of file
+chat_graph
+
+summarizer = load_summarizer(chat_graph, clients.chat_gemini)
\ No newline at end of file
@@ -1,108 +1,225 @@
 
 import os
+import re
+import shutil
+import tempfile
+import time
+from functools import partial
 import torch
 import torch.nn.functional  as F
-import torchvision.transforms as transforms
-from src.graph import chat_graph
-import pandas as pd
+from PIL import Image
+from src.graph import chat_graph, summarizer
+from src.crop_engine import CROP_FEATURES
+from src.metrics import logger, stage_timer
 
 import cv2
 import numpy as np
 
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessageChunk, HumanMessage, SystemMessage
 
 
 
-def crop_recommendation_prediction(input_list, loaded_model, label_encoder, preprocessor):
+def crop_recommendation_prediction(input_list, crop_engine, label_encoder):
     """
-    Takes a list of 7 numeric features and returns the predicted class label.
+    Takes a list of 7 numeric features and returns the top 3 predicted class labels.
     """
-    print("Starting crop recommendation prediction...")
-    print(f"Received input list: {input_list}")
+    if len(input_list) != len(CROP_FEATURES):
+        raise ValueError(f"Input must have exactly {len(CROP_FEATURES)} features.")
 
-    # Validate input length
-    assert len(input_list) == 7, "Input must have exactly 7 features."
+    prediction = crop_recommendation_batch_prediction([input_list], crop_engine, label_encoder, top_k=3)[0]
+    return {"top_3_predictions": prediction["top_k_predictions"]}
 
-    # Convert to 2D DataFrame
-    input_df = pd.DataFrame([input_list], columns=["N", "P", "K", "temperature", "humidity", "ph", "rainfall"])
-    print("Converted input to DataFrame:")
-    print(input_df)
 
-    # Preprocess
-    processed_input = preprocessor.transform(input_df)
-    print("After preprocessing:")
-    print(processed_input)
+def crop_recommendation_batch_prediction(input_matrix, crop_engine, label_encoder, top_k=3, chunk_size=4096):
+    """
+    Takes an (n_rows, 7) matrix of soil features and returns the top-k predicted labels for every row.
+    The crop engine scores one chunk of rows per call.
+    """
+    with stage_timer("crop", "preprocess"):
+        input_matrix = np.asarray(input_matrix, dtype=np.float64)
+        if input_matrix.ndim != 2 or input_matrix.shape[1] != len(CROP_FEATURES):
+            raise ValueError(f"Input must be a 2D matrix with exactly {len(CROP_FEATURES)} features per row.")
 
-    # Convert to tensor
-    input_tensor = torch.tensor(processed_input, dtype=torch.float32).to('cpu')
-    print(f"Converted to tensor: {input_tensor.shape}")
-    print(input_tensor)
+    top_k = min(top_k, len(label_encoder.classes_))
 
-    # Predict
-    loaded_model.eval()
-    with torch.no_grad():
-        logits = loaded_model(input_tensor)
-        print("Logits from model:")
-        print(logits)
-        probs = F.softmax(logits, dim=1)
-        print("Probabilities after softmax:")
-        print(probs)
+    results = []
+    for start in range(0, len(input_matrix), chunk_size):
+        with stage_timer("crop", "forward"):
+            probs = crop_engine.predict_proba(input_matrix[start:start + chunk_size])
 
-    topk_probs, topk_indices = torch.topk(probs, k=3, dim=1)
-    print(f"Top 3 indices: {topk_indices}")
-    print(f"Top 3 probabilities: {topk_probs}")
+        with stage_timer("crop", "postprocess"):
+            topk_indices = np.argsort(-probs, axis=1, kind="stable")[:, :top_k]
+            topk_probs = np.take_along_axis(probs, topk_indices, axis=1)
 
-    topk_indices = topk_indices.tolist()[0]
-    topk_probs = topk_probs.tolist()[0]
+            # Index the encoder's classes directly instead of calling inverse_transform per row.
+            topk_labels = label_encoder.classes_[topk_indices]
 
-    topk_labels = label_encoder.inverse_transform(topk_indices)
-    print(f"Predicted top 3 labels: {topk_labels}")
+            for labels, row_probs in zip(topk_labels, topk_probs):
+                results.append({
+                    "top_k_predictions": [
+                        {"label": str(label), "probability": round(float(prob), 4)}
+                        for label, prob in zip(labels, row_probs)
+                    ]
+                })
 
-    result = {
-        "top_3_predictions": [
-            {"label": label, "probability": round(float(prob), 4)}
-            for label, prob in zip(topk_labels, topk_probs)
-        ]
-    }
-    print("Final prediction response:")
-    print(result)
+    logger.debug("Scored %d crop rows", len(results))
+    return results
+
+
+def crop_sweep_label_indices(label_encoder, labels=None):
+    """Maps the requested crop labels (default: all) to their columns in the model output."""
+    classes = [str(label) for label in label_encoder.classes_]
+    if labels is None:
+        return classes, np.arange(len(classes))
+    unknown = [label for label in labels if label not in classes]
+    if unknown:
+        raise ValueError(f"Unknown crop labels {unknown}.")
+    return list(labels), np.array([classes.index(label) for label in labels])
+
+
+def crop_sweep_chunk(base_row, axes, start, stop, crop_engine, label_indices):
+    """
+    Scores points [start, stop) of the grid spanned by `axes` (a list of (feature, values) pairs),
+    with every other feature taken from `base_row`. Points are numbered in C order, so the last
+    axis varies fastest. Returns a (len(label_indices), stop - start) probability array.
+    """
+    with stage_timer("crop", "preprocess"):
+        shape = tuple(len(values) for _, values in axes)
+        grid_index = np.unravel_index(np.arange(start, stop), shape)
+        rows = np.tile(np.asarray(base_row, dtype=np.float64), (stop - start, 1))
+        for (feature, values), index in zip(axes, grid_index):
+            rows[:, CROP_FEATURES.index(feature)] = np.asarray(values, dtype=np.float64)[index]
+
+    with stage_timer("crop", "forward"):
+        probs = crop_engine.predict_proba(rows)
+    return np.ascontiguousarray(probs[:, label_indices].T)
+
+
+def crop_sweep(base_row, axes, crop_engine, label_indices, chunk_size=8192):
+    """Scores the whole grid, chunk by chunk, into a (labels, *axis lengths) probability tensor."""
+    shape = tuple(len(values) for _, values in axes)
+    n_points = int(np.prod(shape))
+    probs = np.empty((len(label_indices), n_points))
+    for start in range(0, n_points, chunk_size):
+        stop = min(start + chunk_size, n_points)
+        probs[:, start:stop] = crop_sweep_chunk(base_row, axes, start, stop, crop_engine, label_indices)
+    return probs.reshape((len(label_indices), *shape))
 
-    return result
 
 
 
+SOIL_CLASS_NAMES = ['Alluvial soil', 'Black Soil', 'Clay soil', 'Red soil']
+SOIL_IMAGE_SIZE = (128, 128)
+
+
+def decode_soil_image(file):
+    """
+    Opens an uploaded soil photo at reduced resolution. For JPEGs, `draft` makes the decoder
+    scale by 1/2, 1/4 or 1/8 in the DCT domain, so a 12MP upload is never fully decoded.
+    """
+    with stage_timer("soil", "decode"):
+        img = Image.open(file)
+        img.draft("RGB", SOIL_IMAGE_SIZE)
+        return img.convert("RGB")
+
+
+def soil_image_to_tensor(img):
+    """Converts a PIL image into the (3, 128, 128) tensor the soil model expects."""
+    with stage_timer("soil", "preprocess"):
+        # Same bilinear resize and [0, 1] CHW scaling as Resize + ToTensor, without rebuilding a Compose per call.
+        # reducing_gap lets PIL box-reduce large non-JPEG images before the bilinear pass.
+        img = img.resize(SOIL_IMAGE_SIZE, Image.BILINEAR, reducing_gap=3.0)
+        pixels = np.asarray(img, dtype=np.float32) / 255.0
+        return torch.from_numpy(pixels.transpose(2, 0, 1).copy())
+
+
+def soil_type_batch_prediction(image_tensors, soil_type_model):
+    """
+    Runs the soil model once over a list of preprocessed image tensors and
+    returns one probability dict per image, in the same order.
+    """
+    with stage_timer("soil", "forward"):
+        input_batch = torch.stack(image_tensors)
+
+        # Loaders return the model in eval mode, whichever backend it runs on.
+        with torch.no_grad():
+            probs = F.softmax(soil_type_model(input_batch), dim=1)
+
+    with stage_timer("soil", "postprocess"):
+        return [
+            {class_name: round(prob, 6) for class_name, prob in zip(SOIL_CLASS_NAMES, row)}
+            for row in probs.tolist()
+        ]
+
 
 def soil_type_prediction(img, soil_type_model):
-    print("Starting soil_type_prediction...")
-
-    class_names = ['Alluvial soil', 'Black Soil', 'Clay soil', 'Red soil']
-    
-    transform = transforms.Compose([
-        transforms.Resize((128, 128)),
-        transforms.ToTensor(),
-    ])
-
-    input_image = transform(img).unsqueeze(0)
-    print(f"Input image shape: {input_image.shape}")
-
-    soil_type_model.eval()
-    with torch.no_grad():
-        output = soil_type_model(input_image)
-        print(f"Model output: {output}")
-        probs = F.softmax(output, dim=1)
-        print(f"Probabilities: {probs}")
-
-    prob_dict = {
-        class_names[i]: round(probs[0][i].item(), 6)
-        for i in range(len(class_names))
-    }
-
-    print("Prediction successful.")
+    input_image = soil_image_to_tensor(img)
+    prob_dict = soil_type_batch_prediction([input_image], soil_type_model)[0]
+    logger.debug("Soil prediction: %s", prob_dict)
     return prob_dict
 
 
-def query_historic_data_llm(agent_executor,llm_gemini,query):
+def spool_upload(file, filename=None, prefix="upload-", chunk_size=1024 * 1024):
+    """
+    Copies an upload to a named temporary file in chunks, for readers that only open paths
+    (OpenCV video, GDAL). Keeps the upload's extension; the caller deletes the file.
+    """
+    suffix = os.path.splitext(filename or "")[1]
+    with tempfile.NamedTemporaryFile(prefix=prefix, suffix=suffix, delete=False) as out:
+        shutil.copyfileobj(file, out, chunk_size)
+    return out.name
+
+
+SOIL_ARCHIVE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+
+def _open_archive_member(archive, info, max_image_bytes):
+    if info.file_size > max_image_bytes:
+        raise ValueError(f"Image is {info.file_size} bytes uncompressed, more than the {max_image_bytes} allowed.")
+    return archive.open(info)
+
+
+def iter_soil_archive(archive, max_image_bytes):
+    """
+    Yields (name, open) for every image in a zip archive. Members are opened one at a time when
+    their chunk is decoded, so the archive is never extracted or read into memory as a whole.
+    """
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/") or not name.lower().endswith(SOIL_ARCHIVE_EXTENSIONS):
+            continue
+        yield name, partial(_open_archive_member, archive, info, max_image_bytes)
+
+
+def decode_soil_images(items):
+    """Decodes (name, open) pairs into soil tensors; an image that cannot be decoded gets its exception instead."""
+    decoded = []
+    for name, open_image in items:
+        try:
+            with open_image() as file:
+                decoded.append((name, soil_image_to_tensor(decode_soil_image(file))))
+        except Exception as e:
+            decoded.append((name, e))
+    return decoded
+
+
+# Word-sized pieces, so a cached answer streams like a live one instead of arriving as one chunk.
+_CACHED_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+def query_historic_data_llm(agent_executor,llm_gemini,query,cache=None,plan_cache=None):
+    """
+    Yields the final answer as it is generated, token chunk by token chunk. With a plan cache, a
+    question shaped like an earlier one replays that run's tool calls instead of running the agent.
+    """
+    if cache is not None:
+        cached_response = cache.get(query)
+        if cached_response is not None:
+            for chunk in _CACHED_CHUNK.finditer(cached_response):
+                yield chunk.group()
+            return
+
     # Step 1: Agent tries to extract structured data
     agent_sys_msg = SystemMessage(content=(
         "Fetch State_Name, District_Name and other column names (if needed) before proceeding with any logic "
@@ -112,11 +229,30 @@ def query_historic_data_llm(agent_executor,llm_gemini,query):
     user_msg = HumanMessage(content=query)
 
 
-    try:
-        agent_response = agent_executor.invoke([agent_sys_msg, user_msg])
-        agent_output = agent_response.get("output", "")
-    except Exception as e:
-        agent_output = f"[Agent failed]: {e}"
+    agent_failed = False
+    agent_output = None
+    tools = {tool.name: tool for tool in agent_executor.tools}
+    if plan_cache is not None:
+        try:
+            match = plan_cache.lookup(query)
+            if match is not None:
+                agent_output = plan_cache.replay(*match, tools)
+        except Exception:
+            # A broken cache entry or store must never fail the question; fall back to the agent.
+            logger.exception("Plan cache lookup failed for %r", query)
+            plan_cache.record_error()
+            agent_output = None
+
+    if agent_output is None:
+        try:
+            start = time.perf_counter()
+            agent_response = agent_executor.invoke([agent_sys_msg, user_msg])
+            agent_output = agent_response.get("output", "")
+            if plan_cache is not None:
+                plan_cache.capture(query, agent_response.get("intermediate_steps", []), tools, time.perf_counter() - start)
+        except Exception as e:
+            agent_failed = True
+            agent_output = f"[Agent failed]: {e}"
 
 
 
@@ -134,42 +270,108 @@ def query_historic_data_llm(agent_executor,llm_gemini,query):
         HumanMessage(content=f"User Query: {query}\n\nAgent Output: {agent_output}")
     ]
 
-    gemini_response = llm_gemini.invoke(final_query_to_gemini)
-    return gemini_response.content
+    chunks = []
+    for chunk in llm_gemini.stream(final_query_to_gemini):
+        if chunk.content:
+            chunks.append(chunk.content)
+            yield chunk.content
+
+    # Only cache answers backed by a successful agent run, failures should be retried.
+    if cache is not None and not agent_failed:
+        cache.set(query, "".join(chunks))
 
 
 
-def chat_with_llm(config, query,imageUploaded=False,base64_image=None):
+# Nodes whose LLM tokens are the user-facing answer; anything else that calls the LLM must stay silent.
+ANSWER_NODES = {"chat model", "build answer"}
+
+
+async def chat_with_llm(config, query,imageUploaded=False,image_ref=None):
+    """Yields the answer tokens as the answering node generates them, without blocking the event loop."""
 
     if imageUploaded == False:
-        for event in chat_graph.stream({"query":query,"isImageUploaded":False}, config, stream_mode="updates"):
-            print("--Node--")
-            node_name = next(iter(event.keys()))
-            print(node_name)
+        graph_input = {"query":query,"isImageUploaded":False}
     else:
-        for event in chat_graph.stream({"query":query,"isImageUploaded":True,"base64_image":base64_image}, config, stream_mode="updates"):
-            print("--Node--")
-            node_name = next(iter(event.keys()))
-            print(node_name)
-    
-    return chat_graph.get_state(config).values["messages"][-1].content
+        graph_input = {"query":query,"isImageUploaded":True,"image_ref":image_ref}
+
+    streamed = False
+    try:
+        # Turns on the same thread run one at a time, so neither overwrites the other's checkpoint.
+        async with summarizer.locks.hold(config["configurable"]["thread_id"]):
+            # subgraphs=True so tokens from build_answer inside vision_graph are streamed as well.
+            async for _, (message_chunk, metadata) in chat_graph.astream(graph_input, config, stream_mode="messages", subgraphs=True):
+                # Only token chunks: the finished AIMessage a node returns is echoed on this stream as well.
+                if (isinstance(message_chunk, AIMessageChunk) and metadata.get("langgraph_node") in ANSWER_NODES
+                        and isinstance(message_chunk.content, str) and message_chunk.content):
+                    streamed = True
+                    yield message_chunk.content
 
+            # The checkpointed state always holds the complete AIMessage; fall back to it if no node streamed.
+            if not streamed:
+                yield (await chat_graph.aget_state(config)).values["messages"][-1].content
+    finally:
+        # The answer is out, or the client went away mid-stream; either way trim the history to the
+        # token budget off the request path.
+        summarizer.schedule(config)
 
 
 
 
-def detect_weeds_from_image(image_bytes: bytes, weed_detector) -> bytes:
+
+WEED_IMAGE_ENCODINGS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, "image/jpeg"),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, "image/webp"),
+}
+
+
+def run_weed_detector(image_bytes: bytes, weed_detector, imgsz=640, conf=0.25, max_det=300):
+    """Decodes the upload and runs YOLO on it. Returns the decoded image and the YOLO results."""
     # Convert image bytes to OpenCV format
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    with stage_timer("weeds", "decode"):
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Could not decode the uploaded image.")
 
     # Run YOLO inference
-    results = weed_detector(img)
+    with stage_timer("weeds", "forward"):
+        results = weed_detector(img, imgsz=imgsz, conf=conf, max_det=max_det, verbose=False)
 
-    # Draw predictions
-    for r in results:
-        im_array = r.plot()
+    return img, results
 
-    # Encode image with predictions to JPEG
-    _, buffer = cv2.imencode(".jpg", im_array)
-    return buffer.tobytes()
+
+def weed_results_to_detections(results):
+    """Flattens YOLO results into plain dicts: pixel box (x1, y1, x2, y2), class and confidence."""
+    with stage_timer("weeds", "postprocess"):
+        detections = []
+        for r in results:
+            boxes = r.boxes
+            for box, cls, confidence in zip(boxes.xyxy.tolist(), boxes.cls.tolist(), boxes.conf.tolist()):
+                detections.append({
+                    "box": [round(v, 1) for v in box],
+                    "class_id": int(cls),
+                    "class_name": r.names[int(cls)],
+                    "confidence": round(confidence, 4),
+                })
+        return detections
+
+
+def detect_weeds_as_json(image_bytes: bytes, weed_detector, imgsz=640, conf=0.25, max_det=300) -> dict:
+    img, results = run_weed_detector(image_bytes, weed_detector, imgsz=imgsz, conf=conf, max_det=max_det)
+    height, width = img.shape[:2]
+    return {"width": width, "height": height, "detections": weed_results_to_detections(results)}
+
+
+def detect_weeds_from_image(image_bytes: bytes, weed_detector, imgsz=640, conf=0.25, max_det=300, image_format="jpeg", quality=95) -> bytes:
+    img, results = run_weed_detector(image_bytes, weed_detector, imgsz=imgsz, conf=conf, max_det=max_det)
+
+    # Draw predictions
+    with stage_timer("weeds", "postprocess"):
+        for r in results:
+            im_array = r.plot()
+
+    # Encode image with predictions
+    with stage_timer("weeds", "encode"):
+        extension, quality_flag, _ = WEED_IMAGE_ENCODINGS[image_format]
+        _, buffer = cv2.imencode(extension, im_array, [quality_flag, quality])
+        return buffer.tobytes()
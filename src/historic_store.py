@@ -0,0 +1,197 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from langchain_core.tools import Tool
+
+
+HISTORIC_CSV_PATH = "./dataset/crop_historic_data.csv"
+HISTORIC_PARQUET_PATH = "./dataset/crop_historic_data.parquet"
+
+KEY_COLUMNS = ["State_Name", "District_Name", "Crop", "Season"]
+HISTORIC_DTYPES = {
+    "State_Name": "category",
+    "District_Name": "category",
+    "Crop": "category",
+    "Season": "category",
+    "Crop_Year": "int16",
+    # float64: production totals reach ~1e9, beyond float32's 7 significant digits.
+    "Area": "float64",
+    "Production": "float64",
+}
+GROUP_BY_COLUMNS = {
+    "state": "State_Name",
+    "district": "District_Name",
+    "crop": "Crop",
+    "season": "Season",
+    "year": "Crop_Year",
+}
+
+
+def load_historic_frame(csv_path=HISTORIC_CSV_PATH, parquet_path=HISTORIC_PARQUET_PATH):
+    """
+    Loads the historic crop data as a typed, compact DataFrame. The first call converts the CSV
+    to Parquet with categorical keys; later starts read the Parquet file directly.
+    """
+    if parquet_path and os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        df = pd.read_parquet(parquet_path)
+        # A Parquet file written with other column types is rebuilt from the CSV.
+        if all(str(df[column].dtype) == dtype for column, dtype in HISTORIC_DTYPES.items()):
+            return df
+
+    df = pd.read_csv(csv_path)
+    for column in KEY_COLUMNS:
+        # The raw CSV pads some names (e.g. 'Kharif     '), strip them once here.
+        df[column] = df[column].astype(str).str.strip()
+    df = df.dropna(subset=["Crop_Year"]).astype(HISTORIC_DTYPES)
+    df = df.sort_values(["State_Name", "District_Name", "Crop", "Crop_Year"], ignore_index=True)
+
+    if parquet_path:
+        df.to_parquet(parquet_path, index=False)
+    return df
+
+
+# Area of the rows whose Production is known: the yield denominator, so missing production is not read as zero.
+YIELD_AREA = "_yield_area"
+
+
+def _totals(df, keys):
+    """
+    Sums Area, Production and the yield area per `keys` (everything when empty). A group with no
+    known Production stays NaN instead of summing to 0.
+    """
+    if YIELD_AREA not in df.columns:
+        df = df.assign(**{YIELD_AREA: df["Area"].where(df["Production"].notna())})
+    columns = ["Area", "Production", YIELD_AREA]
+    if keys:
+        return df.groupby(keys, observed=True)[columns].sum(min_count=1)
+    return df[columns].sum(min_count=1).to_frame().T
+
+
+def _with_yield(df):
+    df["Yield"] = df["Production"] / df[YIELD_AREA].replace(0, np.nan)
+    return df.drop(columns=YIELD_AREA)
+
+
+def _records(df):
+    """JSON-safe records: missing Production/Yield values become None instead of NaN."""
+    metrics = {column: "float64" for column in ("Area", "Production", "Yield") if column in df.columns}
+    df = df.astype(metrics).round({"Area": 2, "Production": 2, "Yield": 4})
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+class HistoricStore:
+    """
+    Indexed, pre-aggregated view over the historic crop data.
+
+    Rows are kept sorted by (State_Name, District_Name, Crop, Crop_Year) with a MultiIndex, so a
+    lookup is an index slice instead of a full scan. Yearly production/area totals per
+    district, per state and per crop are computed once at startup.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._canonical = {
+            column: {str(name).lower(): name for name in df[column].cat.categories}
+            for column in KEY_COLUMNS
+        }
+
+        index_columns = ["State_Name", "District_Name", "Crop", "Crop_Year"]
+        self.indexed = df.set_index(index_columns).sort_index()
+
+        # The yield area is kept in the yearly tables so query() can re-aggregate them.
+        self.district_yearly = _totals(df, ["State_Name", "District_Name", "Crop", "Crop_Year"])
+        self.state_yearly = _totals(df, ["State_Name", "Crop", "Crop_Year"])
+        self.crop_yearly = _totals(df, ["Crop", "Crop_Year"])
+
+    def canonical(self, column, value):
+        """Maps a user-supplied name to the exact category, case-insensitively. Raises KeyError if unknown."""
+        if value is None:
+            return None
+        try:
+            return self._canonical[column][value.strip().lower()]
+        except KeyError:
+            raise KeyError(f"Unknown {column} '{value}'.") from None
+
+    def values(self, column):
+        """Lists the known values of a key column."""
+        return sorted(self._canonical[column].values())
+
+    def _keys(self, state, district, crop, year_from, year_to):
+        return (
+            self.canonical("State_Name", state),
+            self.canonical("District_Name", district),
+            self.canonical("Crop", crop),
+            slice(year_from, year_to),
+        )
+
+    @staticmethod
+    def _slice(table, keys):
+        keys = tuple(slice(None) if key is None else key for key in keys)
+        try:
+            return table.loc[keys, :]
+        except KeyError:
+            return table.iloc[:0]
+
+    def lookup(self, state=None, district=None, crop=None, year_from=None, year_to=None, limit=None):
+        """Returns the raw per-season rows for the selection, read through the sorted index."""
+        rows = self._slice(self.indexed, self._keys(state, district, crop, year_from, year_to)).reset_index()
+        if limit is not None:
+            rows = rows.head(limit)
+        return _records(rows)
+
+    def query(self, state=None, district=None, crop=None, year_from=None, year_to=None, group_by=("year",)):
+        """
+        Returns total area, production and yield for the selection, grouped by any of
+        'state', 'district', 'crop', 'season' and 'year'.
+        """
+        group_columns = [GROUP_BY_COLUMNS[name] for name in group_by]
+        state, district, crop, years = self._keys(state, district, crop, year_from, year_to)
+
+        # Read from the smallest pre-aggregated table that still has every requested key and grouping.
+        if "Season" in group_columns:
+            selection = self._slice(self.indexed, (state, district, crop, years))
+        elif district is not None or "District_Name" in group_columns:
+            selection = self._slice(self.district_yearly, (state, district, crop, years))
+        elif state is not None or "State_Name" in group_columns:
+            selection = self._slice(self.state_yearly, (state, crop, years))
+        else:
+            selection = self._slice(self.crop_yearly, (crop, years))
+        selection = selection.reset_index()
+
+        result = _totals(selection, group_columns)
+        return _records(_with_yield(result.reset_index() if group_columns else result))
+
+
+def load_historic_store(csv_path=HISTORIC_CSV_PATH, parquet_path=HISTORIC_PARQUET_PATH):
+    return HistoricStore(load_historic_frame(csv_path, parquet_path))
+
+
+def make_historic_query_tool(store, max_rows=50):
+    """Wraps `HistoricStore.query` as a single-input tool the zero-shot pandas agent can call."""
+
+    def historic_query(tool_input: str) -> str:
+        try:
+            params = json.loads(tool_input)
+            if not isinstance(params, dict):
+                raise ValueError("input must be a JSON object")
+            group_by = params.pop("group_by", ["year"])
+            if isinstance(group_by, str):
+                group_by = [group_by]
+            rows = store.query(group_by=tuple(group_by), **params)
+        except (ValueError, KeyError, TypeError) as e:
+            return f"Query failed: {e}"
+        suffix = f"\n({len(rows) - max_rows} more rows omitted)" if len(rows) > max_rows else ""
+        return json.dumps(rows[:max_rows]) + suffix
+
+    return Tool.from_function(
+        func=historic_query,
+        name="historic_crop_query",
+        description=(
+            "Fast, exact lookup of historic Area, Production and Yield totals. Prefer this over writing pandas code. "
+            "Input is a JSON object with optional keys: state, district, crop (names are case-insensitive), "
+            "year_from, year_to (inclusive ints) and group_by (list of 'state', 'district', 'crop', 'season', 'year'; "
+            'default ["year"]). Example: {"state": "Punjab", "crop": "Rice", "year_from": 2005, "group_by": ["year"]}'
+        ),
+    )
@@ -0,0 +1,155 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+
+class ImageStore:
+    """
+    Content-addressed store for chat image uploads.
+
+    `put` normalizes an upload once (downscaled to `max_side` and re-encoded as JPEG) and returns a
+    short reference, the SHA-256 of the original bytes. Graph state and checkpoints only carry that
+    reference; the vision nodes fetch the normalized bytes with `get`. Identical uploads are stored once.
+    Subclasses implement `_read(ref)`, `_write(ref, data)` and `_contains(ref)`.
+    """
+
+    def __init__(self, max_side=1024, quality=85):
+        self.max_side = max_side
+        self.quality = quality
+
+    def normalize(self, image_bytes):
+        img = Image.open(BytesIO(image_bytes))
+        # Let the JPEG decoder downscale in the DCT domain before the exact resize.
+        img.draft("RGB", (self.max_side, self.max_side))
+        img = img.convert("RGB")
+        img.thumbnail((self.max_side, self.max_side), Image.BILINEAR, reducing_gap=3.0)
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+        return buffer.getvalue()
+
+    def put(self, image_bytes):
+        ref = hashlib.sha256(image_bytes).hexdigest()
+        if not self._contains(ref):
+            self._write(ref, self.normalize(image_bytes))
+        return ref
+
+    def get(self, ref):
+        data = self._read(ref)
+        if data is None:
+            raise KeyError(f"Image '{ref}' is no longer in the image store, please upload it again.")
+        return data
+
+    def get_base64(self, ref):
+        return base64.b64encode(self.get(ref)).decode("utf-8")
+
+
+class InMemoryImageStore(ImageStore):
+    """LRU store bounded by the total size of the normalized images."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _contains(self, ref):
+        with self._lock:
+            return ref in self._images
+
+    def _read(self, ref):
+        with self._lock:
+            data = self._images.get(ref)
+            if data is not None:
+                self._images.move_to_end(ref)
+            return data
+
+    def _write(self, ref, data):
+        with self._lock:
+            if ref in self._images:
+                return
+            self._images[ref] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class DiskImageStore(ImageStore):
+    """
+    One file per image under `directory`, shared by every worker on the host. At most once a minute,
+    the least recently written files are deleted until the directory fits in `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024, prune_interval=60, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, ref):
+        return os.path.join(self.directory, f"{ref}.jpg")
+
+    def _contains(self, ref):
+        return os.path.exists(self._path(ref))
+
+    def _read(self, ref):
+        try:
+            with open(self._path(ref), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, ref, data):
+        # Write then rename, so a concurrent reader never sees a partial file.
+        tmp_path = f"{self._path(ref)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(ref))
+
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self._last_prune = time.monotonic()
+            self._prune()
+
+    def _prune(self):
+        entries = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.directory) if entry.name.endswith(".jpg")
+        )
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def load_image_store():
+    """Builds the store selected by IMAGE_STORE_BACKEND ('memory' or 'disk')."""
+    backend = os.getenv("IMAGE_STORE_BACKEND", "memory")
+    options = {
+        "max_side": int(os.getenv("IMAGE_MAX_SIDE", "1024")),
+        "quality": int(os.getenv("IMAGE_JPEG_QUALITY", "85")),
+    }
+    max_bytes = os.getenv("IMAGE_STORE_MAX_BYTES")
+    if max_bytes:
+        options["max_bytes"] = int(max_bytes)
+    if backend == "memory":
+        return InMemoryImageStore(**options)
+    if backend == "disk":
+        return DiskImageStore(os.getenv("IMAGE_STORE_DIR", "./cache/images"), **options)
+    raise ValueError(f"Unknown IMAGE_STORE_BACKEND '{backend}', expected 'memory' or 'disk'.")
+
+
+image_store = load_image_store()
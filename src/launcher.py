@@ -0,0 +1,257 @@
+"""
+Production launcher: loads the CPU models once, then forks the uvicorn workers.
+
+    python -m src.launcher --workers 4 --port 8000
+
+The parent imports the app and loads the models listed in PRELOAD_MODELS (default
+crop,soil,weeds,historic_store). Their tensors are moved into shared memory and the garbage
+collector is frozen before forking, so every worker maps the same weights and DataFrame pages
+instead of holding its own copy. Each worker gets cpu_count / workers torch and OpenCV threads
+(or INFERENCE_TORCH_THREADS). LLM clients are never preloaded; every worker creates its own.
+A worker that dies is restarted from the parent, so it keeps sharing the preloaded models.
+
+    python -m src.launcher --benchmark 1,2,4
+
+starts the launcher at each worker count and reports per-worker memory and throughput.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+DEFAULT_PRELOAD = "crop,soil,weeds,historic_store"
+
+
+def worker_threads(workers):
+    threads = os.getenv("INFERENCE_TORCH_THREADS")
+    return int(threads) if threads else max(1, (os.cpu_count() or 1) // workers)
+
+
+def share_memory(model):
+    """Moves the torch weights of a loaded model, or of each model in a tuple, into shared memory."""
+    import torch
+
+    if isinstance(model, (tuple, list)):
+        for item in model:
+            share_memory(item)
+        return
+    # Engines and YOLO wrap their nn.Module in a `model` attribute.
+    module = model if isinstance(model, torch.nn.Module) else getattr(model, "model", None)
+    if isinstance(module, torch.nn.Module):
+        module.share_memory()
+
+
+def preload(names):
+    """Imports the app and loads `names` in this process, ready to be inherited by forked workers."""
+    import torch
+    import main
+
+    # A single intra-op thread while loading: an OpenMP pool started before fork() can hang the workers.
+    torch.set_num_threads(1)
+    for name in names:
+        share_memory(main.model_registry.get(name))
+
+    # Objects created so far are never collected, so the collector does not write to (and copy) their pages in each worker.
+    gc.freeze()
+    return main.app
+
+
+def run_worker(app, sock, threads):
+    import cv2
+    import torch
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    uvicorn.Server(uvicorn.Config(app, lifespan="on")).run(sockets=[sock])
+
+
+def serve(host="0.0.0.0", port=8000, workers=2, preload_names=None):
+    # Must be set before prometheus_client is imported, so /metrics aggregates every worker.
+    metrics_dir = None
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="agrosphere-metrics-")
+    from prometheus_client import multiprocess
+    from src.metrics import logger
+
+    if preload_names is None:
+        preload_names = [name for name in os.getenv("PRELOAD_MODELS", DEFAULT_PRELOAD).split(",") if name]
+    app = preload(preload_names)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    threads = worker_threads(workers)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, sock, threads)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            os.kill(pid, signal.SIGTERM)
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving on {host}:{port} with {workers} workers, {threads} threads each, preloaded {preload_names}", flush=True)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        multiprocess.mark_process_dead(pid)
+        if not stopping and started is not None:
+            logger.warning("Worker %s exited with status %s, restarting it", pid, status)
+            # Do not spin if workers die right after starting.
+            if time.monotonic() - started < 1:
+                time.sleep(1)
+            spawn()
+
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+## Benchmark
+
+def process_memory(pid):
+    """RSS, PSS (shared pages split between the processes mapping them) and USS (private) in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[key] = int(value.split()[0]) / 1024
+    return {
+        "rss_mb": round(fields["Rss"], 1),
+        "pss_mb": round(fields["Pss"], 1),
+        "uss_mb": round(fields["Private_Clean"] + fields["Private_Dirty"], 1),
+    }
+
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_up(url, path, timeout=300):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}{path}", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url}{path} did not answer 200 within {timeout}s")
+
+
+def generate_load(url, endpoint, duration, concurrency):
+    """Sends requests to `endpoint` from `concurrency` threads for `duration` seconds. Returns requests/s."""
+    import httpx
+    from io import BytesIO
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (512, 512), (120, 80, 40)).save(buffer, format="JPEG")
+    requests = {
+        "crop": lambda client: client.post(f"{url}/predictCrop", json={"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82.0, "ph": 6.5, "rainfall": 202.9}),
+        "soil": lambda client: client.post(f"{url}/predictSoil", files={"file": ("soil.jpg", buffer.getvalue(), "image/jpeg")}),
+    }
+    send = requests[endpoint]
+    counts = [0] * concurrency
+    deadline = time.monotonic() + duration
+
+    def run(i):
+        with httpx.Client(timeout=30) as client:
+            while time.monotonic() < deadline:
+                if send(client).status_code == 200:
+                    counts[i] += 1
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+def benchmark(worker_counts, endpoint="crop", duration=10, concurrency=16, port=8765, preload_names=DEFAULT_PRELOAD):
+    results = []
+    for workers in worker_counts:
+        # Lazy loading: workers only hold what the parent preloaded plus what the benchmarked endpoint loads.
+        env = {**os.environ, "PRELOAD_MODELS": preload_names, "MODEL_LOADING": "lazy", "MODEL_READY_REQUIRED": preload_names}
+        process = subprocess.Popen(
+            [sys.executable, "-m", "src.launcher", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+            env=env,
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            wait_until_up(url, "/health/ready" if preload_names else "/health/live")
+            # Untimed warm-up, so workers that load the model lazily have done so before measuring.
+            generate_load(url, endpoint, 2, concurrency)
+            requests_per_second = generate_load(url, endpoint, duration, concurrency)
+            memory = [process_memory(pid) for pid in child_pids(process.pid)]
+            results.append({
+                "workers": workers,
+                "requests_per_second": round(requests_per_second, 1),
+                "worker_rss_mb": round(sum(m["rss_mb"] for m in memory) / len(memory), 1),
+                "worker_uss_mb": round(sum(m["uss_mb"] for m in memory) / len(memory), 1),
+                "total_pss_mb": round(sum(m["pss_mb"] for m in memory) + process_memory(process.pid)["pss_mb"], 1),
+            })
+            print(json.dumps(results[-1]), flush=True)
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--benchmark", help="Comma-separated worker counts to benchmark, e.g. 1,2,4")
+    parser.add_argument("--endpoint", choices=["crop", "soil"], default="crop", help="Endpoint the benchmark loads")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent benchmark clients")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(
+            [int(n) for n in args.benchmark.split(",")],
+            endpoint=args.endpoint,
+            duration=args.duration,
+            concurrency=args.concurrency,
+            preload_names=os.getenv("PRELOAD_MODELS", DEFAULT_PRELOAD),
+        )
+    else:
+        serve(args.host, args.port, args.workers)
@@ -0,0 +1,103 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+
+logger = logging.getLogger("agrosphere")
+if os.getenv("AGROSPHERE_DEBUG", "0") == "1":
+    logging.basicConfig()
+    logger.setLevel(logging.DEBUG)
+
+
+STAGE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+INFERENCE_STAGE_SECONDS = Histogram(
+    "agrosphere_inference_stage_seconds",
+    "Time spent in each inference stage (decode, preprocess, forward, postprocess, encode).",
+    ["model", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+INFERENCE_REQUESTS = Counter(
+    "agrosphere_inference_requests_total",
+    "Inference requests received per model.",
+    ["model"],
+)
+INFERENCE_ERRORS = Counter(
+    "agrosphere_inference_errors_total",
+    "Inference requests that raised an error per model.",
+    ["model"],
+)
+INFERENCE_IN_FLIGHT = Gauge(
+    "agrosphere_inference_in_flight",
+    "Inference requests currently being processed per model.",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+
+RESPONSE_CACHE_EVENTS = Counter(
+    "agrosphere_response_cache_total",
+    "LLM response cache lookups per cache and result (hit/miss).",
+    ["cache", "result"],
+)
+
+PLAN_CACHE_REPLAYS = Counter(
+    "agrosphere_plan_cache_replays_total",
+    "Cached agent plans replayed per cache and outcome (ok/failed/error).",
+    ["cache", "outcome"],
+)
+PLAN_CACHE_SECONDS_SAVED = Counter(
+    "agrosphere_plan_cache_seconds_saved_total",
+    "Agent time saved by replaying cached plans: the original agent run minus the replay.",
+    ["cache"],
+)
+
+VISION_BRANCH_SECONDS = Histogram(
+    "agrosphere_vision_branch_seconds",
+    "Latency of each vision fan-out branch by outcome (ok, error, timeout, skipped).",
+    ["branch", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+
+
+@contextmanager
+def stage_timer(model, stage):
+    """Records the wall time of one inference stage into the stage histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        INFERENCE_STAGE_SECONDS.labels(model, stage).observe(elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s %s took %.3f ms", model, stage, elapsed * 1000)
+
+
+@contextmanager
+def track_inference(model):
+    """Counts a request for `model`, tracks it as in flight and counts it as an error if it raises."""
+    INFERENCE_REQUESTS.labels(model).inc()
+    in_flight = INFERENCE_IN_FLIGHT.labels(model)
+    in_flight.inc()
+    try:
+        yield
+    except Exception:
+        INFERENCE_ERRORS.labels(model).inc()
+        raise
+    finally:
+        in_flight.dec()
+
+
+def render_metrics():
+    """Returns the Prometheus text exposition of every registered metric and its content type."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Multi-worker launcher: every worker writes its samples under that directory, report them all.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
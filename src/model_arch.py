@@ -3,16 +3,15 @@ import torch
 import torch.nn as nn
 import joblib
 import timm
-import pandas as pd
 
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_experimental.agents import create_pandas_dataframe_agent
 from dotenv import load_dotenv
-from ultralytics import YOLO
 load_dotenv()
 
-from src.credentials import creds
+from src.clients import clients
+from src.crop_engine import CROP_ENGINES
+from src.historic_store import make_historic_query_tool
+from src.vision_backends import load_soil_backend, weed_model_path
 
 
 
@@ -44,22 +43,32 @@ class TabularNet(nn.Module):
 def load_crop_recommendation_model():
     torch.manual_seed(42)
     crop_recommendation_model = TabularNet(input_dim=7, output_dim=22).to("cpu")
-    crop_recommendation_model.load_state_dict(torch.load('./models/crop_recommendation_model.pt',map_location=torch.device('cpu'), weights_only=True)) 
+    # mmap + assign: the weights stay file-backed pages, shared through the page cache by every worker.
+    crop_recommendation_model.load_state_dict(torch.load('./models/crop_recommendation_model.pt',map_location=torch.device('cpu'), weights_only=True, mmap=True), assign=True)
     label_encoder = joblib.load('./artifacts/label_encoder.joblib')
     preprocessor = joblib.load('./artifacts/preprocessor.joblib')
     return crop_recommendation_model, label_encoder, preprocessor
+
+
+def load_crop_engine(crop_recommendation_model, preprocessor, engine=None):
+    """Builds the crop inference engine selected by `engine` or the CROP_ENGINE env var ('numpy' or 'torch')."""
+    engine = engine or os.getenv("CROP_ENGINE", "numpy")
+    if engine not in CROP_ENGINES:
+        raise ValueError(f"Unknown CROP_ENGINE '{engine}', expected one of {list(CROP_ENGINES)}.")
+    return CROP_ENGINES[engine](crop_recommendation_model, preprocessor)
     
 
 ## SOIL TYPE RECOGNITION MODEL
 
 class MobileeNetV2(nn.Module):
-    def __init__(self, num_classes: int):
+    def __init__(self, num_classes: int, pretrained: bool = False):
         super(MobileeNetV2, self).__init__()
 
-        # Load EfficientNetB3 base model
+        # Load EfficientNetB3 base model. The fine-tuned state dict overwrites every weight,
+        # so the ImageNet weights are only worth downloading when training from scratch.
         self.base_model = timm.create_model(
             'mobilenetv2_100',
-            pretrained=True,
+            pretrained=pretrained,
             num_classes=0  # Remove original classification head
         )
 
@@ -77,34 +86,42 @@ class MobileeNetV2(nn.Module):
         return x
 
 
-def load_soil_type_detection_model():
-    torch.manual_seed(42)
-    soil_detect_model=MobileeNetV2(num_classes=4).to('cpu')
-    soil_detect_model.load_state_dict(torch.load('./models/soiltype_mobilenet_CNN.pt',map_location=torch.device('cpu'), weights_only=True))
-    return soil_detect_model
+def load_soil_type_detection_model(backend=None):
+    """Loads the soil model for `backend` or the SOIL_BACKEND env var (see src.vision_backends, default 'eager')."""
+    def load_fp32():
+        torch.manual_seed(42)
+        soil_detect_model=MobileeNetV2(num_classes=4).to('cpu')
+        soil_detect_model.load_state_dict(torch.load('./models/soiltype_mobilenet_CNN.pt',map_location=torch.device('cpu'), weights_only=True, mmap=True), assign=True)
+        return soil_detect_model.eval()
+
+    return load_soil_backend(load_fp32, backend)
 
 
 def load_gemini():
-    return ChatGoogleGenerativeAI(api_key=os.getenv("GOOGLE_API_KEY"),
-                            model="gemini-2.0-flash",credentials=creds)
+    return clients.chat_gemini()
 
 
-def load_csv_executor(llm_gemini):
+def load_csv_executor(llm_gemini, historic_store):
+    # Imported here: langchain_experimental is slow to import and only this loader needs it.
+    from langchain_experimental.agents import create_pandas_dataframe_agent
 
-    df = pd.read_csv("./dataset/crop_historic_data.csv")
     agent_executor = create_pandas_dataframe_agent(
     llm_gemini,
-    df,
+    historic_store.df,
     agent_type="zero-shot-react-description",
     verbose=True,
     return_intermediate_steps=True,
     allow_dangerous_code=True,
-    handle_parsing_errors=True
+    handle_parsing_errors=True,
+    extra_tools=[make_historic_query_tool(historic_store)]
     )
 
     return agent_executor
 
 
 def load_weed_detector():
-    weed_detector = YOLO("./models/weed_detector.pt")
+    # Imported here: ultralytics is slow to import and only this loader needs it.
+    from ultralytics import YOLO
+    # WEEDS_BACKEND picks the checkpoint or one of its exports (see src.vision_backends).
+    weed_detector = YOLO(weed_model_path(), task="detect")
     return weed_detector
\ No newline at end of file
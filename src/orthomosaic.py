@@ -0,0 +1,225 @@
+"""
+Tiled weed detection for drone orthomosaics.
+
+The mosaic is opened with rasterio (GDAL) and read one window at a time, in row-major order so
+GDAL's block cache serves the overlap between neighbouring tiles. Uncompressed GeoTIFFs are
+memory-mapped instead of read through the cache. YOLO runs on batches of overlapping
+`tile`-pixel tiles; the detections are shifted into mosaic pixel coordinates and duplicates from
+neighbouring tiles are merged. Peak memory is one batch of tiles plus the detections, whatever
+the size of the mosaic.
+"""
+import os
+import warnings
+
+import cv2
+import numpy as np
+
+from src.helper import weed_results_to_detections
+from src.metrics import stage_timer
+
+
+# GDAL block cache in MB; one row of tiles of a strip-organized mosaic should fit in it.
+ORTHO_GDAL_CACHE_MB = int(os.getenv("ORTHO_GDAL_CACHE_MB", "256"))
+
+
+def tile_origins(length, tile, overlap):
+    """Tile start offsets along one axis. The last tile is flush with the edge instead of padded."""
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, tile - overlap))
+    origins.append(length - tile)
+    return origins
+
+
+class Orthomosaic:
+    """
+    A raster opened for windowed reads, with its georeferencing (None for plain images).
+    GDAL settings are per thread: open, use and close it on the same one.
+    """
+
+    def __init__(self, path):
+        import rasterio
+        from rasterio.errors import NotGeoreferencedWarning
+
+        self._env = rasterio.Env(GDAL_CACHEMAX=ORTHO_GDAL_CACHE_MB, GTIFF_VIRTUAL_MEM_IO="IF_ENOUGH_RAM")
+        self._env.__enter__()
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", NotGeoreferencedWarning)
+                self.dataset = rasterio.open(path)
+        except Exception:
+            self._env.__exit__(None, None, None)
+            raise
+
+        self.width, self.height = self.dataset.width, self.dataset.height
+        if self.dataset.dtypes[0] != "uint8":
+            self.close()
+            raise ValueError(f"Expected an 8-bit RGB raster, got {self.dataset.dtypes[0]}.")
+        # RGB(A) uses the first three bands; grayscale (with or without alpha) is repeated.
+        self.bands = [1, 2, 3] if self.dataset.count >= 3 else [1, 1, 1]
+        self.nodata = self.dataset.nodata or 0
+        georeferenced = self.dataset.crs is not None or not self.dataset.transform.is_identity
+        self.transform = self.dataset.transform if georeferenced else None
+        self.crs = self.dataset.crs.to_string() if self.dataset.crs is not None else None
+
+    def read(self, x, y, width, height):
+        """Reads a window as an (height, width, 3) BGR array, like cv2.imdecode."""
+        from rasterio.windows import Window
+
+        with stage_timer("weeds", "decode"):
+            pixels = self.dataset.read(self.bands, window=Window(x, y, width, height))
+            return np.ascontiguousarray(pixels[::-1].transpose(1, 2, 0))
+
+    def read_overview(self, max_size):
+        """The whole mosaic downsampled so its longer side is at most `max_size`, and the scale used."""
+        from rasterio.enums import Resampling
+
+        scale = min(1.0, max_size / max(self.width, self.height))
+        out_shape = (3, max(1, round(self.height * scale)), max(1, round(self.width * scale)))
+        # Decimated reads use the file's internal overviews when it has them.
+        pixels = self.dataset.read(self.bands, out_shape=out_shape, resampling=Resampling.average)
+        return np.ascontiguousarray(pixels[::-1].transpose(1, 2, 0)), scale
+
+    def to_geo(self, box):
+        """Maps a pixel box to georeferenced coordinates (the raster CRS)."""
+        x1, y1 = self.transform * (box[0], box[1])
+        x2, y2 = self.transform * (box[2], box[3])
+        return [round(v, 7) for v in (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))]
+
+    def close(self):
+        self.dataset.close()
+        self._env.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _intersection_over_smaller(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / (np.minimum(area, areas) + 1e-9)
+
+
+def merge_tile_detections(detections, threshold=0.5):
+    """
+    Cross-tile NMS. Boxes from different tiles of the same class that overlap by more than
+    `threshold` of the smaller one are one object: a duplicate from the overlap, or pieces of a
+    weed cut by a tile edge. Each group becomes the union of its boxes with the highest confidence.
+    Boxes from the same tile were already suppressed by YOLO and never end up in one group, not even
+    through a box from another tile that overlaps both.
+    """
+    if not detections:
+        return []
+    boxes = np.array([detection["box"] for detection in detections], dtype=np.float64)
+    classes = np.array([detection["class_id"] for detection in detections])
+    tiles = np.array([detection["tile"] for detection in detections])
+
+    parent = list(range(len(detections)))
+    # Tiles of each group, kept up to date for group roots only.
+    group_tiles = [{tile} for tile in tiles.tolist()]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Sweep along x: only boxes whose x ranges overlap are compared.
+    order = np.argsort(boxes[:, 0], kind="stable")
+    sorted_x1 = boxes[order, 0]
+    for position, i in enumerate(order):
+        end = np.searchsorted(sorted_x1, boxes[i, 2], side="left")
+        candidates = order[position + 1:end]
+        candidates = candidates[(classes[candidates] == classes[i]) & (tiles[candidates] != tiles[i])]
+        if not len(candidates):
+            continue
+        for j in candidates[_intersection_over_smaller(boxes[i], boxes[candidates]) > threshold]:
+            root_i, root_j = find(i), find(j)
+            if root_i == root_j or group_tiles[root_i] & group_tiles[root_j]:
+                continue
+            parent[root_j] = root_i
+            group_tiles[root_i] |= group_tiles[root_j]
+
+    groups = {}
+    for i in range(len(detections)):
+        groups.setdefault(find(i), []).append(i)
+
+    merged = []
+    for members in groups.values():
+        best = max(members, key=lambda i: detections[i]["confidence"])
+        group_boxes = boxes[members]
+        box = [*group_boxes[:, :2].min(axis=0), *group_boxes[:, 2:].max(axis=0)]
+        detection = {key: value for key, value in detections[best].items() if key != "tile"}
+        merged.append({**detection, "box": [round(float(v), 1) for v in box]})
+    merged.sort(key=lambda detection: (detection["box"][1], detection["box"][0]))
+    return merged
+
+
+def detect_weeds_tiled(mosaic, weed_detector, tile=640, overlap=128, batch_size=8, conf=0.25, max_det=300, merge_threshold=0.5):
+    """
+    Runs the weed detector over the whole mosaic in overlapping tiles, `batch_size` tiles per
+    forward pass, and returns the merged detections in mosaic pixels with some tiling statistics.
+    Tiles that are entirely nodata (the black border around an orthomosaic) are skipped.
+    """
+    if not 0 <= overlap < tile:
+        raise ValueError("The tile overlap must be smaller than the tile size.")
+    windows = [
+        (x, y, min(tile, mosaic.width), min(tile, mosaic.height))
+        for y in tile_origins(mosaic.height, tile, overlap)
+        for x in tile_origins(mosaic.width, tile, overlap)
+    ]
+
+    detections, skipped = [], 0
+    for start in range(0, len(windows), batch_size):
+        batch, origins = [], []
+        for index, (x, y, width, height) in enumerate(windows[start:start + batch_size], start):
+            pixels = mosaic.read(x, y, width, height)
+            if not (pixels != mosaic.nodata).any():
+                skipped += 1
+                continue
+            batch.append(pixels)
+            origins.append((index, x, y))
+        if not batch:
+            continue
+
+        with stage_timer("weeds", "forward"):
+            results = weed_detector(batch, imgsz=tile, conf=conf, max_det=max_det, verbose=False)
+        for (index, x, y), result in zip(origins, results):
+            for detection in weed_results_to_detections([result]):
+                x1, y1, x2, y2 = detection["box"]
+                detections.append({**detection, "box": [x1 + x, y1 + y, x2 + x, y2 + y], "tile": index})
+
+    with stage_timer("weeds", "postprocess"):
+        merged = merge_tile_detections(detections, merge_threshold)
+        if mosaic.transform is not None:
+            for detection in merged:
+                detection["geo_box"] = mosaic.to_geo(detection["box"])
+
+    return {
+        "width": mosaic.width,
+        "height": mosaic.height,
+        "crs": mosaic.crs,
+        "transform": list(mosaic.transform)[:6] if mosaic.transform is not None else None,
+        "tiles": len(windows),
+        "skipped_tiles": skipped,
+        "detections": merged,
+    }
+
+
+def render_overview(mosaic, detections, max_size=2048, quality=90):
+    """A downsampled JPEG of the mosaic with the detections drawn on it."""
+    image, scale = mosaic.read_overview(max_size)
+    with stage_timer("weeds", "encode"):
+        for detection in detections:
+            x1, y1, x2, y2 = (round(v * scale) for v in detection["box"])
+            cv2.rectangle(image, (x1, y1), (max(x2, x1 + 1), max(y2, y1 + 1)), (0, 0, 255), 1 if scale < 0.5 else 2)
+        _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
@@ -0,0 +1,214 @@
+"""
+Query-plan cache for the historic-data pandas agent.
+
+The agent answers "yield of Rice in Ludhiana over the years" by having the LLM write pandas code
+over several ReAct round trips. The code it settles on works just as well for "yield of Wheat in
+Amritsar over the years", so after a successful run the tool steps are stored as a plan with the
+entity literals (state, district, crop, year) replaced by placeholders. The key is the question
+with the same entities replaced, e.g. "yield of __crop_0__ in __district_0__ over the years".
+A later question with the same shape replays the plan's tool calls with its own entities and
+skips the agent entirely; only the final answer is still written by the LLM.
+
+A plan is only stored if it is safe to reuse: every entity of the question appears in its code,
+and the code names no other state, district, crop or year, which would silently be kept for
+a different question.
+"""
+import json
+import re
+import time
+
+from src.metrics import PLAN_CACHE_REPLAYS, PLAN_CACHE_SECONDS_SAVED, logger
+from src.response_cache import load_response_cache, normalize_query
+
+
+ENTITY_COLUMNS = {"state": "State_Name", "district": "District_Name", "crop": "Crop"}
+YEAR_PATTERN = re.compile(r"\b(19[5-9]\d|20[0-4]\d)\b")
+PLACEHOLDER_PATTERN = re.compile(r"__(state|district|crop|year)_(\d+)(?:_(lower|upper))?__")
+QUOTED_PATTERN = re.compile(r"(['\"])(.*?)\1")
+FAILED_OBSERVATION = re.compile(r"^(Query failed:|\w*(Error|Exception)\b)")
+
+
+class EntityMatcher:
+    """Finds the states, districts, crops and years a question mentions, by exact (normalized) name."""
+
+    def __init__(self, store):
+        self.names = {}
+        for kind, column in ENTITY_COLUMNS.items():
+            for value in store.values(column):
+                self.names.setdefault(normalize_query(str(value)), []).append((kind, str(value)))
+        self.max_words = max((len(name.split()) for name in self.names), default=1)
+
+    def extract(self, query):
+        """
+        Returns the question's template key and its entities ({"crop_0": "Rice", "year_0": "2010"}),
+        or None if a name is ambiguous (a district that is also a state, say).
+        """
+        words = normalize_query(query).split()
+        template, entities, counts = [], {}, {}
+        i = 0
+        while i < len(words):
+            for n in range(min(self.max_words, len(words) - i), 0, -1):
+                matches = self.names.get(" ".join(words[i:i + n]))
+                if matches:
+                    break
+            else:
+                matches, n = None, 1
+
+            if matches is None and YEAR_PATTERN.fullmatch(words[i]):
+                matches = [("year", words[i])]
+            if matches is None:
+                template.append(words[i])
+            elif len(matches) > 1:
+                return None
+            else:
+                kind, value = matches[0]
+                name = f"{kind}_{counts.get(kind, 0)}"
+                counts[kind] = counts.get(kind, 0) + 1
+                entities[name] = value
+                template.append(f"__{name}__")
+            i += n
+        return " ".join(template), entities
+
+    def is_entity(self, text):
+        return normalize_query(text) in self.names
+
+
+def _parameterize(text, entities):
+    for name, value in sorted(entities.items(), key=lambda item: -len(item[1])):
+        if name.startswith("year"):
+            text = re.sub(rf"(?<!\d){value}(?!\d)", f"__{name}__", text)
+            continue
+
+        def placeholder(match, name=name, value=value):
+            found = match.group(0)
+            if found == value:
+                return f"__{name}__"
+            if found == value.lower():
+                return f"__{name}_lower__"
+            if found == value.upper():
+                return f"__{name}_upper__"
+            return found
+
+        text = re.sub(rf"(?<!\w){re.escape(value)}(?!\w)", placeholder, text, flags=re.IGNORECASE)
+    return text
+
+
+def _render(template, entities):
+    def value(match):
+        kind, index, case = match.groups()
+        text = entities[f"{kind}_{index}"]
+        return text.lower() if case == "lower" else text.upper() if case == "upper" else text
+
+    return PLACEHOLDER_PATTERN.sub(value, template)
+
+
+class QueryPlanCache:
+    """
+    Stores parameterized agent plans in a ResponseCache (same backends, LRU + TTL and hit/miss
+    counters) and replays them through the agent's own tools.
+    """
+
+    def __init__(self, cache, get_store):
+        self.cache = cache
+        self.get_store = get_store
+        self._matcher = None
+        self._matcher_store = None
+        self.replays = 0
+        self.replay_failures = 0
+        self.errors = 0
+        self.seconds_saved = 0.0
+
+    @property
+    def matcher(self):
+        store = self.get_store()
+        if self._matcher_store is not store:
+            self._matcher, self._matcher_store = EntityMatcher(store), store
+        return self._matcher
+
+    def lookup(self, query):
+        """Returns (plan, entities) for a cached question of the same shape, else None."""
+        extracted = self.matcher.extract(query)
+        if extracted is None:
+            return None
+        key, entities = extracted
+        plan = self.cache.get(key)
+        return (json.loads(plan), entities) if plan is not None else None
+
+    def capture(self, query, intermediate_steps, tool_names, agent_seconds):
+        """Stores the successful tool steps of an agent run as a plan, if they can be reused safely."""
+        extracted = self.matcher.extract(query)
+        if extracted is None:
+            return False
+        key, entities = extracted
+
+        steps = []
+        for action, observation in intermediate_steps:
+            if action.tool not in tool_names or FAILED_OBSERVATION.match(str(observation)):
+                continue
+            tool_input = action.tool_input if isinstance(action.tool_input, str) else json.dumps(action.tool_input)
+            steps.append({"tool": action.tool, "input": _parameterize(tool_input, entities)})
+        if not steps:
+            return False
+
+        code = "\n".join(step["input"] for step in steps)
+        used = {f"{kind}_{index}" for kind, index, _ in PLACEHOLDER_PATTERN.findall(code)}
+        if used != set(entities):
+            logger.debug("Not caching plan for %r: entities %s missing from its code", query, set(entities) - used)
+            return False
+        stray = [text for _, text in QUOTED_PATTERN.findall(code) if self.matcher.is_entity(text)]
+        if stray or YEAR_PATTERN.search(PLACEHOLDER_PATTERN.sub("", code)):
+            logger.debug("Not caching plan for %r: its code names entities the question does not", query)
+            return False
+
+        self.cache.set(key, json.dumps({"steps": steps, "agent_seconds": round(agent_seconds, 3)}))
+        return True
+
+    def replay(self, plan, entities, tools):
+        """
+        Runs the plan's tool calls with `entities` and returns their results as the agent output,
+        or None if a step fails (the caller then runs the full agent).
+        """
+        start = time.perf_counter()
+        outputs = []
+        for step in plan["steps"]:
+            tool_input = _render(step["input"], entities)
+            try:
+                observation = str(tools[step["tool"]].run(tool_input))
+            except Exception as e:
+                observation = f"{type(e).__name__}: {e}"
+            if FAILED_OBSERVATION.match(observation):
+                self.replay_failures += 1
+                PLAN_CACHE_REPLAYS.labels(self.cache.name, "failed").inc()
+                logger.debug("Plan replay failed at %s: %s", step["tool"], observation)
+                return None
+            outputs.append(f"{step['tool']} input:\n{tool_input}\nresult:\n{observation}")
+
+        saved = max(plan["agent_seconds"] - (time.perf_counter() - start), 0.0)
+        self.replays += 1
+        self.seconds_saved += saved
+        PLAN_CACHE_REPLAYS.labels(self.cache.name, "ok").inc()
+        PLAN_CACHE_SECONDS_SAVED.labels(self.cache.name).inc(saved)
+        return "\n\n".join(outputs)
+
+    def record_error(self):
+        """Counts a lookup or replay that raised; the caller treats it as a miss and runs the agent."""
+        self.errors += 1
+        PLAN_CACHE_REPLAYS.labels(self.cache.name, "error").inc()
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "replays": self.replays,
+            "replay_failures": self.replay_failures,
+            "errors": self.errors,
+            "seconds_saved": round(self.seconds_saved, 3),
+        }
+
+
+def load_plan_cache(get_store):
+    """
+    Builds the plan cache on the HISTORIC_PLAN_CACHE_* settings (see load_response_cache), or
+    returns None when HISTORIC_PLAN_CACHE_BACKEND is 'none'.
+    """
+    cache = load_response_cache("historic_plan")
+    return QueryPlanCache(cache, get_store) if cache is not None else None
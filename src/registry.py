@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+import time
+
+from src.metrics import logger
+
+
+MODEL_LOADING_MODES = ("eager", "background", "lazy")
+
+
+class ModelRegistry:
+    """
+    Loads each model once, on first use or in the background, and reports per-model load state.
+
+    `register(name, loader, warmup=None)` declares a model without loading it. `get(name)` returns it,
+    loading it first if needed (concurrent callers wait for the same load). After loading, `warmup` is
+    called `warmup_runs` times with the model so the first real request does not pay for lazy kernel
+    initialisation. A failed load is reported and retried on the next `get`.
+    """
+
+    def __init__(self, warmup_runs=1):
+        self.warmup_runs = warmup_runs
+        self._entries = {}
+
+    def register(self, name, loader, warmup=None):
+        self._entries[name] = {
+            "loader": loader,
+            "warmup": warmup,
+            "lock": threading.Lock(),
+            "model": None,
+            "state": "pending",
+            "load_seconds": None,
+            "error": None,
+        }
+
+    def get(self, name):
+        entry = self._entries[name]
+        if entry["state"] == "ready":
+            return entry["model"]
+        with entry["lock"]:
+            if entry["state"] != "ready":
+                self._load(name, entry)
+            return entry["model"]
+
+    async def aget(self, name):
+        """Like `get`, but waits for a load in a worker thread instead of blocking the event loop."""
+        entry = self._entries[name]
+        if entry["state"] == "ready":
+            return entry["model"]
+        return await asyncio.to_thread(self.get, name)
+
+    def _load(self, name, entry):
+        entry["state"] = "loading"
+        start = time.perf_counter()
+        try:
+            model = entry["loader"]()
+            if entry["warmup"] is not None:
+                for _ in range(self.warmup_runs):
+                    entry["warmup"](model)
+        except Exception as e:
+            entry["state"], entry["error"] = "failed", str(e)
+            logger.exception("Loading model %s failed", name)
+            raise
+        entry["model"], entry["error"] = model, None
+        entry["load_seconds"] = round(time.perf_counter() - start, 3)
+        entry["state"] = "ready"
+        logger.info("Loaded model %s in %.2fs", name, entry["load_seconds"])
+
+    def start(self, mode="background", names=None):
+        """Loads `names` (default: every registered model) now ('eager'), in a daemon thread ('background') or not at all ('lazy')."""
+        if mode not in MODEL_LOADING_MODES:
+            raise ValueError(f"Unknown model loading mode '{mode}', expected one of {MODEL_LOADING_MODES}.")
+        names = list(names or self._entries)
+        if mode == "eager":
+            for name in names:
+                self.get(name)
+        elif mode == "background":
+            threading.Thread(target=self._preload, args=(names,), name="model-preload", daemon=True).start()
+
+    def _preload(self, names):
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                pass  # Already logged; the next request retries the load.
+
+    def is_ready(self, names=None):
+        return all(self._entries[name]["state"] == "ready" for name in (names or self._entries))
+
+    def status(self):
+        return {
+            name: {"state": entry["state"], "load_seconds": entry["load_seconds"], "error": entry["error"]}
+            for name, entry in self._entries.items()
+        }
+
+
+def load_model_registry():
+    """Builds an empty registry; MODEL_WARMUP_RUNS sets how many warmup inferences run after each load."""
+    return ModelRegistry(warmup_runs=int(os.getenv("MODEL_WARMUP_RUNS", "1")))
@@ -0,0 +1,156 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from src.metrics import RESPONSE_CACHE_EVENTS
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Folds case, punctuation and whitespace so near-identical questions share one cache key."""
+    query = _PUNCTUATION.sub(" ", query.casefold())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class ResponseCache:
+    """
+    Base class for LLM response caches with LRU + TTL eviction.
+
+    Subclasses implement `_get(key)` and `_set(key, value)` on already-normalized keys and provide
+    the `_lock` that also guards the hit/miss counters.
+    """
+
+    def __init__(self, name, max_entries=1024, ttl_seconds=24 * 3600):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        value = self._get(normalize_query(query))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        RESPONSE_CACHE_EVENTS.labels(self.name, "miss" if value is None else "hit").inc()
+        return value
+
+    def set(self, query, value):
+        self._set(normalize_query(query), value)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "name": self.name,
+            "backend": type(self).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class InMemoryResponseCache(ResponseCache):
+
+    def __init__(self, name, max_entries=1024, ttl_seconds=24 * 3600):
+        super().__init__(name, max_entries, ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Persists entries in a local SQLite file so the cache survives restarts and is shared by workers."""
+
+    def __init__(self, name, path, max_entries=1024, ttl_seconds=24 * 3600):
+        super().__init__(name, max_entries, ttl_seconds)
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connect()
+        # A SQLite connection must not be used across fork(); forked workers open their own.
+        os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if now - stored_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def _set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE stored_at < ? OR key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl_seconds, self.max_entries),
+            )
+
+
+def load_response_cache(name):
+    """
+    Builds the cache selected by <NAME>_CACHE_BACKEND ('memory', 'sqlite' or 'none'), sized by
+    <NAME>_CACHE_MAX_ENTRIES and <NAME>_CACHE_TTL_SECONDS. Returns None when caching is disabled.
+    """
+    prefix = name.upper()
+    backend = os.getenv(f"{prefix}_CACHE_BACKEND", "memory")
+    max_entries = int(os.getenv(f"{prefix}_CACHE_MAX_ENTRIES", "1024"))
+    ttl_seconds = float(os.getenv(f"{prefix}_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return InMemoryResponseCache(name, max_entries, ttl_seconds)
+    if backend == "sqlite":
+        path = os.getenv(f"{prefix}_CACHE_PATH", f"./cache/{name}_responses.sqlite3")
+        return SQLiteResponseCache(name, path, max_entries, ttl_seconds)
+    raise ValueError(f"Unknown {prefix}_CACHE_BACKEND '{backend}', expected 'memory', 'sqlite' or 'none'.")
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 
 class SoilInput(BaseModel):
     N: float = Field(..., example=5.1)
@@ -13,3 +15,44 @@ class SoilInput(BaseModel):
         return [self.N, self.P, self.K, self.temperature, self.humidity, self.ph, self.rainfall]
 
 
+class SoilBatchInput(BaseModel):
+    records: List[SoilInput] = Field(..., min_length=1)
+    top_k: int = Field(3, ge=1, le=22)
+
+    def to_matrix(self):
+        return [record.to_list() for record in self.records]
+
+
+CropFeature = Literal["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+
+class SweepAxis(BaseModel):
+    feature: CropFeature
+    values: Optional[List[float]] = Field(None, min_length=1, example=[5.0, 5.5, 6.0, 6.5, 7.0])
+    start: Optional[float] = Field(None, example=50.0)
+    stop: Optional[float] = Field(None, example=300.0)
+    steps: int = Field(10, ge=1, le=10000)
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.values is None and (self.start is None or self.stop is None):
+            raise ValueError("A sweep axis needs either `values` or `start` and `stop`.")
+        return self
+
+    def to_values(self):
+        if self.values is not None:
+            return self.values
+        return np.linspace(self.start, self.stop, self.steps).tolist()
+
+
+class CropSweepInput(BaseModel):
+    base: SoilInput
+    axes: List[SweepAxis] = Field(..., min_length=1, max_length=3)
+    labels: Optional[List[str]] = Field(None, min_length=1, description="Crops to return (default: all)")
+
+    @model_validator(mode="after")
+    def check_axes(self):
+        features = [axis.feature for axis in self.axes]
+        if len(set(features)) != len(features):
+            raise ValueError("Each feature can be swept by one axis only.")
+        return self
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+from langchain_core.messages import HumanMessage, RemoveMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.metrics import logger, stage_timer
+
+
+class ThreadLocks:
+    """
+    One asyncio lock per conversation thread, dropped again once nobody holds or waits for it.
+    Waiting for a busy thread suspends the turn instead of blocking the event loop.
+
+    The asyncio lock only covers this process. When the checkpointer is shared between workers
+    (`BoundedSqliteSaver`), the holder also takes the checkpointer's per-thread lease, polling every
+    `poll_interval` seconds; a lease left behind by a dead worker expires after `lease_seconds`.
+    """
+
+    def __init__(self, checkpointer=None, lease_seconds=300, poll_interval=0.05):
+        self.checkpointer = checkpointer if hasattr(checkpointer, "acquire_thread_lock") else None
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._locks = {}
+
+    @asynccontextmanager
+    async def hold(self, thread_id):
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                if self.checkpointer is None:
+                    yield
+                    return
+                owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+                while not await asyncio.to_thread(self.checkpointer.acquire_thread_lock, thread_id, owner, self.lease_seconds):
+                    await asyncio.sleep(self.poll_interval)
+                try:
+                    yield
+                finally:
+                    await asyncio.to_thread(self.checkpointer.release_thread_lock, thread_id, owner)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[thread_id]
+
+
+def split_for_summary(messages, token_budget, keep_tokens, keep_messages=2):
+    """
+    Returns (to_summarize, to_keep). Nothing is summarized while `messages` fits in `token_budget`;
+    past that, the newest messages that fit in `keep_tokens` are kept (never fewer than `keep_messages`)
+    and everything older is folded into the summary.
+    """
+    if count_tokens_approximately(messages) <= token_budget:
+        return [], messages
+
+    split = len(messages) - keep_messages
+    while split > 0 and count_tokens_approximately(messages[split - 1:]) <= keep_tokens:
+        split -= 1
+    return messages[:split], messages[split:]
+
+
+async def summarize_messages(llm, summary, messages):
+    """Folds `messages` into `summary`, sending only the messages being dropped rather than the whole history."""
+    if summary:
+        instruction = (
+            f"This is the summary of the conversation until now: {summary}\n\n"
+            "Extend the summary by taking into account the new messages above."
+        )
+    else:
+        instruction = "Create a summary of the conversation above."
+    response = await llm.ainvoke(messages + [HumanMessage(content=instruction)])
+    return response.content
+
+
+class ConversationSummarizer:
+    """
+    Keeps chat prompts bounded by a token budget without making the user wait for it.
+
+    `schedule(config)` is called once a turn has finished streaming. If the thread's messages exceed
+    `token_budget` (approximate tokens), the older ones are folded into the running summary in a
+    background task on the event loop and removed from the checkpointed state. At most
+    `max_concurrent` summaries run at once. Turns and summary writes for the same thread are
+    serialized through `locks`, across workers too when the graph's checkpointer is shared; the
+    summary LLM call itself runs outside the lock. `get_llm()` returns the chat model to summarize with.
+    """
+
+    def __init__(self, graph, get_llm, token_budget=2000, keep_tokens=1000, max_concurrent=2, lock_lease_seconds=300):
+        self.graph = graph
+        self.get_llm = get_llm
+        self.token_budget = token_budget
+        self.keep_tokens = keep_tokens
+        self.locks = ThreadLocks(graph.checkpointer, lease_seconds=lock_lease_seconds)
+
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._pending = set()
+        # The event loop only keeps weak references to tasks.
+        self._tasks = set()
+
+    def schedule(self, config):
+        """Starts a background summary for the thread; must be called from the event loop."""
+        thread_id = config["configurable"]["thread_id"]
+        # One summary per thread at a time; the next turn reschedules if still over budget.
+        if thread_id in self._pending:
+            return None
+        self._pending.add(thread_id)
+        task = asyncio.get_running_loop().create_task(self._run(config))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        try:
+            async with self._slots:
+                await self.summarize(config)
+        except Exception:
+            logger.exception("Background summary failed for thread %s", thread_id)
+        finally:
+            self._pending.discard(thread_id)
+
+    async def summarize(self, config):
+        """Summarizes the thread now if it is over budget. Returns True if the state was updated."""
+        values = (await self.graph.aget_state(config)).values
+        to_summarize, _ = split_for_summary(values.get("messages", []), self.token_budget, self.keep_tokens)
+        if not to_summarize:
+            return False
+
+        with stage_timer("chat", "summarize"):
+            summary = await summarize_messages(self.get_llm(), values.get("summary"), to_summarize)
+
+        async with self.locks.hold(config["configurable"]["thread_id"]):
+            # A turn may have finished meanwhile; only remove messages that are still there.
+            current_ids = {m.id for m in (await self.graph.aget_state(config)).values.get("messages", [])}
+            removals = [RemoveMessage(id=m.id) for m in to_summarize if m.id in current_ids]
+            await self.graph.aupdate_state(config, {"summary": summary, "messages": removals}, as_node="chat model")
+        return True
+
+
+def load_summarizer(graph, get_llm):
+    """Builds the summarizer from CHAT_TOKEN_BUDGET, CHAT_KEEP_TOKENS, CHAT_SUMMARY_WORKERS and CHAT_LOCK_LEASE_SECONDS."""
+    return ConversationSummarizer(
+        graph,
+        get_llm,
+        token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "2000")),
+        keep_tokens=int(os.getenv("CHAT_KEEP_TOKENS", "1000")),
+        max_concurrent=int(os.getenv("CHAT_SUMMARY_WORKERS", "2")),
+        lock_lease_seconds=float(os.getenv("CHAT_LOCK_LEASE_SECONDS", "300")),
+    )
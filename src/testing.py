@@ -0,0 +1,25 @@
+import base64
+import json
+
+
+def fake_credentials(token_uri):
+    """
+    A throwaway base64 service account for GOOGLE_CREDENTIALS_BASE64, whose OAuth token endpoint is
+    `token_uri`. Used by the tests and the benchmark harness so src.credentials can be imported
+    without real credentials.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    info = {
+        "type": "service_account",
+        "project_id": "benchmark",
+        "private_key_id": "benchmark",
+        "private_key": pem.decode(),
+        "client_email": "benchmark@benchmark.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": token_uri,
+    }
+    return base64.b64encode(json.dumps(info).encode()).decode()
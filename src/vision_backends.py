@@ -0,0 +1,321 @@
+"""
+Optimized CPU backends for the soil classifier and the weed detector.
+
+Soil (SOIL_BACKEND):
+- "eager": the fp32 model as trained (default).
+- "channels_last": fp32 with NHWC weights and inputs, which oneDNN convolutions prefer.
+- "int8_dynamic": dynamic int8 quantization of the Linear layers. MobileNetV2 is convolution-bound,
+  so expect little from it; it needs no calibration data.
+- "compile": torch.compile; the first inference after loading is slow while it compiles.
+- "torchscript", "int8_static", "onnx": prebuilt artifacts, see `export_soil_backend`. "int8_static" is
+  FX-graph static quantization (x86 qconfig) calibrated on sample images, saved as TorchScript. "onnx"
+  runs on ONNX Runtime (optional dependency: pip install onnx onnxruntime).
+
+Weeds (WEEDS_BACKEND): "torch" (the .pt checkpoint, default), or an Ultralytics export: "torchscript",
+"onnx", "openvino" or "openvino_int8". Exported models load through YOLO() like the checkpoint, so
+the detection code does not change.
+
+Build the artifacts with:
+
+    python -m src.vision_backends soil --backend onnx --images ./fixtures/soil
+    python -m src.vision_backends weeds --backend openvino_int8 --images ./fixtures/weeds
+
+which also reports parity against fp32 and per-image latency on the given images.
+"""
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+SOIL_BACKENDS = ("eager", "channels_last", "int8_dynamic", "compile", "torchscript", "int8_static", "onnx")
+SOIL_ARTIFACTS = {
+    "torchscript": "./models/soiltype_mobilenet.torchscript.pt",
+    "int8_static": "./models/soiltype_mobilenet_int8.torchscript.pt",
+    "onnx": "./models/soiltype_mobilenet.onnx",
+}
+SOIL_INPUT_SHAPE = (1, 3, 128, 128)
+
+WEED_CHECKPOINT = "./models/weed_detector.pt"
+# backend -> (Ultralytics export format, export options, artifact path written by the export)
+WEED_BACKENDS = {
+    "torch": (None, {}, WEED_CHECKPOINT),
+    "torchscript": ("torchscript", {}, "./models/weed_detector.torchscript"),
+    "onnx": ("onnx", {"simplify": True}, "./models/weed_detector.onnx"),
+    "openvino": ("openvino", {}, "./models/weed_detector_openvino_model"),
+    "openvino_int8": ("openvino", {"int8": True}, "./models/weed_detector_int8_openvino_model"),
+}
+
+
+class ChannelsLastModel(nn.Module):
+    """Runs the wrapped model on NHWC (channels_last) inputs."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model.to(memory_format=torch.channels_last)
+
+    def forward(self, x):
+        return self.model(x.contiguous(memory_format=torch.channels_last))
+
+
+class OnnxSoilModel:
+    """ONNX Runtime session behind the same call signature as the torch model: NCHW float tensor in, logits out."""
+
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or torch.get_num_threads()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        (logits,) = self.session.run(None, {self.input_name: x.numpy()})
+        return torch.from_numpy(logits)
+
+
+def build_soil_backend(model, backend):
+    """Builds an in-process backend ('eager', 'channels_last', 'int8_dynamic' or 'compile') from the fp32 model."""
+    model = model.eval()
+    if backend == "eager":
+        return model
+    if backend == "channels_last":
+        return ChannelsLastModel(model).eval()
+    if backend == "int8_dynamic":
+        return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    if backend == "compile":
+        return torch.compile(model)
+    raise ValueError(f"Soil backend '{backend}' is built by export_soil_backend, not at load time.")
+
+
+def _soil_example(calibration):
+    return calibration[:1] if calibration is not None else torch.rand(SOIL_INPUT_SHAPE)
+
+
+def export_soil_backend(model, backend, path=None, calibration=None):
+    """
+    Writes the artifact for 'torchscript', 'int8_static' or 'onnx' and returns its path.
+    `calibration` is an (N, 3, 128, 128) batch of preprocessed images; 'int8_static' calibrates its
+    activation ranges on it, so it should be real soil photos.
+    """
+    path = path or SOIL_ARTIFACTS[backend]
+    model = model.eval()
+    example = _soil_example(calibration)
+
+    if backend == "onnx":
+        torch.onnx.export(
+            model, example, path,
+            input_names=["image"], output_names=["logits"],
+            dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=17,
+        )
+        return path
+
+    if backend == "int8_static":
+        if calibration is None:
+            raise ValueError("int8_static needs calibration images.")
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        torch.backends.quantized.engine = "x86"
+        prepared = prepare_fx(model, get_default_qconfig_mapping("x86"), (example,))
+        with torch.no_grad():
+            for batch in calibration.split(16):
+                prepared(batch)
+        model = convert_fx(prepared)
+    elif backend != "torchscript":
+        raise ValueError(f"Soil backend '{backend}' has no artifact to export.")
+
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, example))
+    torch.jit.save(traced, path)
+    return path
+
+
+def load_soil_backend(load_fp32_model, backend=None, path=None):
+    """
+    Returns the soil model for `backend` (default: SOIL_BACKEND, else 'eager'). Artifact backends load
+    their prebuilt file; the others are built from `load_fp32_model()`.
+    """
+    backend = backend or os.getenv("SOIL_BACKEND", "eager")
+    if backend not in SOIL_BACKENDS:
+        raise ValueError(f"Unknown SOIL_BACKEND '{backend}', expected one of {list(SOIL_BACKENDS)}.")
+    if backend not in SOIL_ARTIFACTS:
+        return build_soil_backend(load_fp32_model(), backend)
+
+    path = path or os.getenv("SOIL_MODEL_PATH") or SOIL_ARTIFACTS[backend]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found, build it with: python -m src.vision_backends soil --backend {backend}")
+    if backend == "onnx":
+        return OnnxSoilModel(path)
+    if backend == "int8_static":
+        torch.backends.quantized.engine = "x86"
+    return torch.jit.load(path, map_location="cpu").eval()
+
+
+def weed_model_path(backend=None):
+    """Path of the weed detector for `backend` (default: WEEDS_BACKEND, else 'torch'); WEEDS_MODEL_PATH overrides it."""
+    backend = backend or os.getenv("WEEDS_BACKEND", "torch")
+    if backend not in WEED_BACKENDS:
+        raise ValueError(f"Unknown WEEDS_BACKEND '{backend}', expected one of {list(WEED_BACKENDS)}.")
+    return os.getenv("WEEDS_MODEL_PATH") or WEED_BACKENDS[backend][2]
+
+
+def export_weed_backend(backend, checkpoint=WEED_CHECKPOINT, imgsz=640, data=None):
+    """
+    Exports the weed detector with Ultralytics and returns the artifact path. 'openvino_int8' calibrates
+    on `data`, an Ultralytics dataset YAML of representative field images.
+    """
+    from ultralytics import YOLO
+
+    export_format, options, _ = WEED_BACKENDS[backend]
+    if export_format is None:
+        return checkpoint
+    if options.get("int8") and data:
+        options = {**options, "data": data}
+    return YOLO(checkpoint).export(format=export_format, imgsz=imgsz, **options)
+
+
+## Parity and latency checks
+
+def load_fixture_images(directory, size, limit=64):
+    """Loads up to `limit` .jpg/.png images from `directory` as RGB PIL images resized to `size`."""
+    from PIL import Image
+
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith((".jpg", ".jpeg", ".png")))
+    return [Image.open(os.path.join(directory, name)).convert("RGB").resize(size) for name in names[:limit]]
+
+
+def check_soil_parity(reference, candidate, batch):
+    """
+    Compares two soil backends on a preprocessed batch: max abs logit and softmax differences
+    and top-1 agreement.
+    """
+    with torch.no_grad():
+        expected_logits = reference(batch)
+        actual_logits = candidate(batch).float()
+    expected = torch.softmax(expected_logits, dim=1)
+    actual = torch.softmax(actual_logits, dim=1)
+    return {
+        "max_logit_diff": float((expected_logits - actual_logits).abs().max()),
+        "max_abs_diff": float((expected - actual).abs().max()),
+        "top1_agreement": float((expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean()),
+    }
+
+
+def _box_iou(a, b):
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def check_weed_parity(reference, candidate, images, iou=0.5, **predict_options):
+    """
+    Runs both detectors on BGR `images` and reports the share of reference detections the candidate
+    finds again (same class, IoU >= `iou`), and the share of candidate detections that match one.
+    """
+    matched, total_reference, total_candidate = 0, 0, 0
+    for img in images:
+        ref = reference(img, verbose=False, **predict_options)[0].boxes
+        cand = candidate(img, verbose=False, **predict_options)[0].boxes
+        total_reference += len(ref)
+        total_candidate += len(cand)
+        if len(ref) and len(cand):
+            ious = _box_iou(ref.xyxy.cpu().numpy(), cand.xyxy.cpu().numpy())
+            same_class = ref.cls.cpu().numpy()[:, None] == cand.cls.cpu().numpy()[None, :]
+            matched += int(((ious >= iou) & same_class).any(axis=1).sum())
+    return {
+        "reference_detections": total_reference,
+        "candidate_detections": total_candidate,
+        "recall_vs_fp32": matched / total_reference if total_reference else 1.0,
+        "precision_vs_fp32": matched / total_candidate if total_candidate else 1.0,
+    }
+
+
+def measure_latency(fn, inputs, repeats=3):
+    """Median milliseconds per call of `fn` over `inputs`, after one untimed warm-up pass."""
+    import time
+
+    for item in inputs[:2]:
+        fn(item)
+    timings = []
+    for _ in range(repeats):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def size_mb(path):
+    """Size of a model file, or of every file in a model directory, in MB."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 2**20
+    return os.path.getsize(path) / 2**20
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=["soil", "weeds"])
+    parser.add_argument("--backend", required=True)
+    parser.add_argument("--images", help="Directory of fixture images for calibration and parity (default: random images)")
+    parser.add_argument("--data", help="weeds openvino_int8: Ultralytics dataset YAML used for calibration")
+    parser.add_argument("--imgsz", type=int, default=640, help="weeds: export and inference size")
+    parser.add_argument("--conf", type=float, default=0.25, help="weeds: detection confidence used for parity")
+    args = parser.parse_args()
+
+    if args.model == "soil":
+        from src.helper import SOIL_IMAGE_SIZE, soil_image_to_tensor
+        from src.model_arch import load_soil_type_detection_model
+
+        if args.images:
+            batch = torch.stack([soil_image_to_tensor(img) for img in load_fixture_images(args.images, SOIL_IMAGE_SIZE)])
+        else:
+            print("No --images given, using random images; int8_static calibration needs real photos.")
+            batch = torch.rand(32, *SOIL_INPUT_SHAPE[1:])
+
+        fp32 = load_soil_type_detection_model(backend="eager")
+        if args.backend in SOIL_ARTIFACTS:
+            print("Wrote", export_soil_backend(fp32, args.backend, calibration=batch))
+        candidate = load_soil_backend(lambda: load_soil_type_detection_model(backend="eager"), args.backend)
+
+        singles = list(batch.split(1))
+        report = {
+            "backend": args.backend,
+            **check_soil_parity(fp32, candidate, batch),
+            "fp32_ms_per_image": measure_latency(fp32, singles),
+            "backend_ms_per_image": measure_latency(candidate, singles),
+            "fp32_mb": size_mb("./models/soiltype_mobilenet_CNN.pt"),
+            "backend_mb": size_mb(SOIL_ARTIFACTS[args.backend]) if args.backend in SOIL_ARTIFACTS else None,
+        }
+    else:
+        import cv2
+        from ultralytics import YOLO
+
+        if args.images:
+            images = [cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR) for img in load_fixture_images(args.images, (args.imgsz, args.imgsz))]
+        else:
+            print("No --images given, using random images; parity on noise says little about accuracy.")
+            images = list(np.random.default_rng(0).integers(0, 256, size=(8, args.imgsz, args.imgsz, 3), dtype=np.uint8))
+
+        path = export_weed_backend(args.backend, imgsz=args.imgsz, data=args.data)
+        print("Wrote", path)
+        fp32, candidate = YOLO(WEED_CHECKPOINT), YOLO(path, task="detect")
+        options = {"imgsz": args.imgsz, "conf": args.conf}
+        report = {
+            "backend": args.backend,
+            **check_weed_parity(fp32, candidate, images, **options),
+            "fp32_ms_per_image": measure_latency(lambda img: fp32(img, verbose=False, **options), images),
+            "backend_ms_per_image": measure_latency(lambda img: candidate(img, verbose=False, **options), images),
+            "fp32_mb": size_mb(WEED_CHECKPOINT),
+            "backend_mb": size_mb(path),
+        }
+    print(json.dumps(report, indent=2))
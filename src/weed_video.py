@@ -0,0 +1,183 @@
+"""
+Weed detection over videos and frame sequences.
+
+YOLO runs on every `every`-th frame, and on any frame that differs from the one before it by
+more than `scene_threshold` (a camera cut or a jolt). Between detections, WeedTracker
+carries each box forward at its last measured velocity, so every frame gets detections while
+only a fraction of them pay for a forward pass. Frames are decoded one at a time and dropped
+once processed, so memory does not grow with the length of the video.
+"""
+import cv2
+import numpy as np
+
+from src.helper import weed_results_to_detections
+from src.metrics import stage_timer
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU of two (n, 4) and (m, 4) arrays of x1, y1, x2, y2 boxes."""
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+
+class WeedTracker:
+    """
+    Greedy IoU tracker with constant-velocity motion. Detections are matched to the tracks' boxes
+    extrapolated to the current frame, highest IoU first and only within the same class. A track
+    that goes unmatched for more than `max_misses` detection rounds is dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=1):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self.total_tracks = 0
+
+    def reset(self):
+        self.tracks = []
+
+    def _predicted_box(self, track, frame):
+        return track["box"] + track["velocity"] * (frame - track["frame"])
+
+    def update(self, frame, detections):
+        """Matches one frame's detections to the tracks and returns them with their track ids."""
+        if self.tracks and detections:
+            predicted = np.array([self._predicted_box(track, frame) for track in self.tracks])
+            boxes = np.array([detection["box"] for detection in detections], dtype=np.float64)
+            iou = box_iou(predicted, boxes)
+            same_class = np.array([track["class_id"] for track in self.tracks])[:, None] == np.array([d["class_id"] for d in detections])[None, :]
+            iou[~same_class] = 0.0
+        else:
+            iou = np.zeros((len(self.tracks), len(detections)))
+
+        matches = {}
+        for track_index, detection_index in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+            if iou[track_index, detection_index] < self.iou_threshold:
+                break
+            if track_index in matches or detection_index in matches.values():
+                continue
+            matches[track_index] = detection_index
+
+        tracked = []
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in matches:
+                track["misses"] += 1
+                continue
+            detection = detections[matches[track_index]]
+            box = np.array(detection["box"], dtype=np.float64)
+            velocity = (box - track["box"]) / max(frame - track["frame"], 1)
+            # Smooth the velocity once it has been measured, the raw estimate jitters with the boxes.
+            track["velocity"] = velocity if track["hits"] == 1 else 0.5 * track["velocity"] + 0.5 * velocity
+            track.update(box=box, frame=frame, misses=0, hits=track["hits"] + 1, detection=detection)
+            tracked.append({"track_id": track["id"], **detection})
+
+        matched_detections = set(matches.values())
+        for detection_index, detection in enumerate(detections):
+            if detection_index in matched_detections:
+                continue
+            self.total_tracks += 1
+            track = {
+                "id": self.total_tracks, "box": np.array(detection["box"], dtype=np.float64), "velocity": np.zeros(4),
+                "class_id": detection["class_id"], "frame": frame, "misses": 0, "hits": 1, "detection": detection,
+            }
+            self.tracks.append(track)
+            tracked.append({"track_id": track["id"], **detection})
+
+        self.tracks = [track for track in self.tracks if track["misses"] <= self.max_misses]
+        return tracked
+
+    def predict(self, frame, width, height):
+        """Boxes of the tracks matched at the last detection, carried forward to `frame`."""
+        predicted = []
+        for track in self.tracks:
+            if track["misses"]:
+                continue
+            box = self._predicted_box(track, frame)
+            box = np.clip(box, 0, [width, height, width, height])
+            if box[2] - box[0] < 1 or box[3] - box[1] < 1:
+                continue
+            predicted.append({"track_id": track["id"], **track["detection"], "box": [round(float(v), 1) for v in box]})
+        return predicted
+
+
+def iter_video_frames(path):
+    """Decodes a video file one frame at a time."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open the uploaded video.")
+    try:
+        while True:
+            with stage_timer("weeds", "decode"):
+                ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+def video_info(path):
+    """Frame rate and frame count of a video file (the count is None if the container does not say)."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open the uploaded video.")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or None
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        return {"fps": fps, "frames": frames}
+    finally:
+        capture.release()
+
+
+def iter_image_frames(files):
+    """Decodes a sequence of uploaded image files, in order, one at a time."""
+    for name, file in files:
+        with stage_timer("weeds", "decode"):
+            frame = cv2.imdecode(np.frombuffer(file.read(), np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError(f"Could not decode frame {name}.")
+        yield frame
+
+
+def frame_signature(frame):
+    """A 64x36 grayscale thumbnail, compared between frames to detect scene changes."""
+    small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+
+def track_weeds(frames, weed_detector, fps=30.0, every=5, scene_threshold=8.0, imgsz=640, conf=0.25, max_det=300, tracker=None):
+    """
+    Yields one dict per frame: its index, timestamp, whether YOLO ran on it and its detections,
+    each with a track id. `scene_threshold` is the mean absolute grayscale difference (0-255) from
+    the previous frame that forces a detection; 0 disables scene-change detection.
+    """
+    tracker = tracker or WeedTracker()
+    last_signature = None
+    last_detected = None
+    for index, frame in enumerate(frames):
+        height, width = frame.shape[:2]
+        detect = last_detected is None or index - last_detected >= every
+        signature = frame_signature(frame) if scene_threshold else None
+        if not detect and signature is not None and np.abs(signature - last_signature).mean() > scene_threshold:
+            # A cut or a fast pan: the tracks no longer describe this frame.
+            tracker.reset()
+            detect = True
+
+        if detect:
+            with stage_timer("weeds", "forward"):
+                results = weed_detector(frame, imgsz=imgsz, conf=conf, max_det=max_det, verbose=False)
+            detections = tracker.update(index, weed_results_to_detections(results))
+            last_detected = index
+        else:
+            with stage_timer("weeds", "track"):
+                detections = tracker.predict(index, width, height)
+        last_signature = signature
+
+        yield {"frame": index, "time": round(index / fps, 3), "detected": detect, "detections": detections}
+
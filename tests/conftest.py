@@ -0,0 +1,22 @@
+import os
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# src.credentials decodes the service account at import time; tests never call the providers.
+if not os.getenv("GOOGLE_CREDENTIALS_BASE64"):
+    from src.testing import fake_credentials
+
+    os.environ["GOOGLE_CREDENTIALS_BASE64"] = fake_credentials("http://127.0.0.1:9/token")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    """Runs the test from the repository root, where the loaders look for models/ and artifacts/."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from src.batcher import MicroBatcher
+from src.executor import InferenceBusyError
+
+
+def test_concurrent_items_share_one_batch():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or [item * 2 for item in items], max_batch_size=4, max_wait_ms=500)
+
+    futures = [batcher.submit(i) for i in range(4)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6]
+    assert calls == [[0, 1, 2, 3]]
+    assert batcher.stats()["batch_size_histogram"] == {"1": 0, "2": 0, "3": 0, "4": 1}
+
+
+def test_partial_batch_flushes_after_max_wait():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or items, max_batch_size=8, max_wait_ms=20)
+
+    futures = [batcher.submit(i) for i in range(3)]
+
+    assert [future.result(timeout=5) for future in futures] == [0, 1, 2]
+    assert calls == [[0, 1, 2]]
+
+
+def test_batch_fn_error_reaches_every_future():
+    def fail(items):
+        raise ValueError("bad batch")
+
+    batcher = MicroBatcher(fail, max_batch_size=2, max_wait_ms=500)
+    futures = [batcher.submit(i) for i in range(2)]
+
+    for future in futures:
+        with pytest.raises(ValueError, match="bad batch"):
+            future.result(timeout=5)
+
+
+def test_output_count_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait_ms=500)
+    futures = [batcher.submit(i) for i in range(2)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="2 inputs"):
+            future.result(timeout=5)
+
+
+def test_full_queue_is_rejected():
+    started, release = threading.Event(), threading.Event()
+
+    def slow(items):
+        started.set()
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0, max_queue=2)
+    running = batcher.submit("running")
+    assert started.wait(5)
+    queued = [batcher.submit("a"), batcher.submit("b")]
+
+    with pytest.raises(InferenceBusyError):
+        batcher.submit("c")
+
+    release.set()
+    assert running.result(timeout=5) == "running"
+    assert [future.result(timeout=5) for future in queued] == ["a", "b"]
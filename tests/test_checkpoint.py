@@ -0,0 +1,148 @@
+import asyncio
+import operator
+from collections import Counter
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.graph import START, StateGraph
+
+from src import checkpoint
+from src.checkpoint import BoundedMemorySaver, BoundedSqliteSaver
+
+
+class State(TypedDict):
+    turns: Annotated[list, operator.add]
+
+
+def build_graph(saver):
+    """A parent graph whose one node is a two-step subgraph, so checkpoints land in two namespaces."""
+    inner = StateGraph(State)
+    inner.add_node("ask", lambda state: {"turns": ["ask"]})
+    inner.add_node("answer", lambda state: {"turns": ["answer"]})
+    inner.add_edge(START, "ask")
+    inner.add_edge("ask", "answer")
+
+    inner = inner.compile()
+
+    outer = StateGraph(State)
+    outer.add_node("chat", lambda state: {"turns": inner.invoke({"turns": []})["turns"]})
+    outer.add_edge(START, "chat")
+    return outer.compile(checkpointer=saver)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(checkpoint, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_saver(request, tmp_path):
+    def make(**bounds):
+        if request.param == "memory":
+            return BoundedMemorySaver(**bounds)
+        saver = BoundedSqliteSaver.from_path(str(tmp_path / "checkpoints.sqlite3"), evict_interval=0, **bounds)
+        saver.setup()
+        return saver
+    return make
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def checkpoints_per_namespace(saver, thread_id):
+    return Counter(item.config["configurable"]["checkpoint_ns"] for item in saver.list(config(thread_id)))
+
+
+def test_history_is_trimmed_per_thread_and_namespace(make_saver):
+    saver = make_saver(max_history=2)
+    graph = build_graph(saver)
+
+    for _ in range(4):
+        graph.invoke({"turns": ["user"]}, config("a"))
+    graph.invoke({"turns": ["user"]}, config("b"))
+
+    per_namespace = checkpoints_per_namespace(saver, "a")
+    assert per_namespace[""] == 2
+    assert len(per_namespace) > 1
+    assert all(count <= 2 for count in per_namespace.values())
+    # Trimming old checkpoints must not lose any of the state the latest one points at.
+    assert graph.get_state(config("a")).values["turns"] == ["user", "ask", "answer"] * 4
+    assert graph.get_state(config("b")).values["turns"] == ["user", "ask", "answer"]
+
+
+def test_idle_threads_expire(make_saver, clock):
+    saver = make_saver(ttl_seconds=60)
+    graph = build_graph(saver)
+
+    graph.invoke({"turns": ["user"]}, config("idle"))
+    clock.now += 30
+    graph.invoke({"turns": ["user"]}, config("active"))
+    clock.now += 45
+    graph.invoke({"turns": ["user"]}, config("new"))
+
+    assert saver.get_tuple(config("idle")) is None
+    assert saver.get_tuple(config("active")) is not None
+    assert saver.get_tuple(config("new")) is not None
+
+
+def test_least_recently_used_threads_are_evicted(make_saver, clock):
+    saver = make_saver(max_threads=2)
+    graph = build_graph(saver)
+
+    for thread_id in ("first", "second"):
+        graph.invoke({"turns": ["user"]}, config(thread_id))
+        clock.now += 1
+    graph.invoke({"turns": ["user"]}, config("first"))
+    clock.now += 1
+    graph.invoke({"turns": ["user"]}, config("third"))
+
+    assert saver.get_tuple(config("second")) is None
+    assert list(saver.list(config("second"))) == []
+    assert graph.get_state(config("first")).values["turns"] == ["user", "ask", "answer"] * 2
+    assert saver.get_tuple(config("third")) is not None
+
+
+def test_sqlite_conversations_survive_reopen(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    saver = BoundedSqliteSaver.from_path(path, max_history=2)
+    build_graph(saver).invoke({"turns": ["user"]}, config("a"))
+    saver.conn.close()
+
+    reopened = BoundedSqliteSaver.from_path(path, max_history=2)
+    graph = build_graph(reopened)
+    assert graph.get_state(config("a")).values["turns"] == ["user", "ask", "answer"]
+
+    graph.invoke({"turns": ["user"]}, config("a"))
+    assert graph.get_state(config("a")).values["turns"] == ["user", "ask", "answer"] * 2
+
+
+def test_async_graph_uses_the_bounded_saver(make_saver):
+    saver = make_saver(max_history=2)
+    graph = build_graph(saver)
+
+    async def run():
+        for _ in range(3):
+            await graph.ainvoke({"turns": ["user"]}, config("a"))
+        state = await graph.aget_state(config("a"))
+        history = [item async for item in saver.alist(config("a"))]
+        return state, history, await saver.aget_tuple(config("a"))
+
+    state, history, latest = asyncio.run(run())
+    assert state.values["turns"] == ["user", "ask", "answer"] * 3
+    assert Counter(item.config["configurable"]["checkpoint_ns"] for item in history)[""] == 2
+    assert latest.checkpoint["id"] == state.config["configurable"]["checkpoint_id"]
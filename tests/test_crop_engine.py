@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import torch
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.crop_engine import CROP_FEATURES, FoldedCropEngine, TorchCropEngine, check_parity
+from src.model_arch import TabularNet, load_crop_recommendation_model
+
+
+def assert_parity(model, preprocessor):
+    parity = check_parity(TorchCropEngine(model, preprocessor), FoldedCropEngine(model, preprocessor))
+    assert parity["max_abs_diff"] <= 1e-5
+    assert parity["top1_agreement"] == 1.0
+
+
+def test_folded_engine_matches_trained_model(repo_root):
+    model, _, preprocessor = load_crop_recommendation_model()
+    assert_parity(model, preprocessor)
+
+
+def test_folded_engine_matches_random_model():
+    # Non-trivial BatchNorm statistics and scaler, so every folding step is exercised.
+    torch.manual_seed(0)
+    model = TabularNet(input_dim=len(CROP_FEATURES), output_dim=22)
+    with torch.no_grad():
+        for module in model.net:
+            if isinstance(module, torch.nn.BatchNorm1d):
+                module.weight.uniform_(0.5, 1.5)
+                module.bias.uniform_(-0.5, 0.5)
+                module.running_mean.uniform_(-1, 1)
+                module.running_var.uniform_(0.5, 2)
+
+    rng = np.random.default_rng(0)
+    training = rng.normal([50, 50, 50, 25, 70, 6.5, 100], [30, 30, 40, 5, 20, 1, 50], size=(500, len(CROP_FEATURES)))
+    training[rng.random(training.shape) < 0.05] = np.nan
+    preprocessor = Pipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())])
+    preprocessor.fit(pd.DataFrame(training, columns=CROP_FEATURES))
+    assert_parity(model, preprocessor)
+
+
+def test_folded_engine_fills_missing_values_like_the_imputer(repo_root):
+    model, _, preprocessor = load_crop_recommendation_model()
+    row = np.array([[90, np.nan, 43, 20.88, np.nan, 6.5, 202.94]])
+    torch_probs = TorchCropEngine(model, preprocessor).predict_proba(row)
+    numpy_probs = FoldedCropEngine(model, preprocessor).predict_proba(row)
+    np.testing.assert_allclose(numpy_probs, torch_probs, atol=1e-5)
@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import pytest
+from langgraph.graph import END
+
+from src import graph
+from src.fanout import load_fanout_config, run_fanout
+
+
+def provider(delay, result="ok", error=None, cancelled=None):
+    """A stub vision provider answering after `delay` seconds, or raising `error`."""
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(result)
+            raise
+        if error is not None:
+            raise error
+        return result
+    return call
+
+
+def fanout(branches, **config):
+    start = time.perf_counter()
+    results, failures = asyncio.run(run_fanout(branches, **config))
+    return results, failures, time.perf_counter() - start
+
+
+def test_all_waits_for_every_branch():
+    results, failures, elapsed = fanout({"fast": provider(0.01, "a"), "slow": provider(0.1, "b")}, policy="all", timeout=1)
+    assert results == {"fast": "a", "slow": "b"}
+    assert failures == {}
+    assert 0.1 <= elapsed < 0.5
+
+
+def test_all_drops_a_branch_that_misses_the_timeout():
+    cancelled = []
+    results, failures, elapsed = fanout(
+        {"fast": provider(0.01, "a"), "slow": provider(5, "b", cancelled=cancelled)}, policy="all", timeout=0.1
+    )
+    assert results == {"fast": "a"}
+    assert failures == {"slow": "timeout"}
+    assert elapsed < 0.5
+    assert cancelled == ["b"]
+
+
+def test_failed_branch_is_dropped():
+    results, failures, _ = fanout(
+        {"bad": provider(0.01, error=RuntimeError("provider down")), "good": provider(0.05, "b")}, policy="all", timeout=1
+    )
+    assert results == {"good": "b"}
+    assert failures["bad"].startswith("error:") and "provider down" in failures["bad"]
+
+
+def test_first_returns_the_first_success():
+    cancelled = []
+    results, failures, elapsed = fanout(
+        {"fast": provider(0.01, "a"), "slow": provider(5, "b", cancelled=cancelled)}, policy="first", timeout=10
+    )
+    assert results == {"fast": "a"}
+    assert failures == {"slow": "skipped"}
+    assert elapsed < 0.5
+    assert cancelled == ["b"]
+
+
+def test_first_skips_past_a_failure_to_the_next_success():
+    results, failures, _ = fanout(
+        {"bad": provider(0.01, error=RuntimeError("boom")), "good": provider(0.05, "b")}, policy="first", timeout=1
+    )
+    assert results == {"good": "b"}
+    assert "bad" in failures
+
+
+def test_first_times_out_when_nothing_succeeds():
+    results, failures, elapsed = fanout({"slow": provider(5)}, policy="first", timeout=0.1)
+    assert results == {}
+    assert failures == {"slow": "timeout"}
+    assert elapsed < 0.5
+
+
+def test_best_within_keeps_what_succeeded_by_the_soft_deadline():
+    results, failures, elapsed = fanout(
+        {"fast": provider(0.01, "a"), "medium": provider(0.05, "b"), "slow": provider(5, "c")},
+        policy="best_within", timeout=10, best_within=0.2,
+    )
+    assert results == {"fast": "a", "medium": "b"}
+    assert failures == {"slow": "skipped"}
+    assert 0.2 <= elapsed < 0.6
+
+
+def test_best_within_falls_back_to_the_first_success_after_the_soft_deadline():
+    results, failures, elapsed = fanout(
+        {"late": provider(0.2, "a"), "slow": provider(5, "b")}, policy="best_within", timeout=10, best_within=0.05
+    )
+    assert results == {"late": "a"}
+    assert failures == {"slow": "skipped"}
+    assert 0.2 <= elapsed < 0.6
+
+
+def test_best_within_times_out_when_nothing_succeeds():
+    results, failures, elapsed = fanout({"slow": provider(5)}, policy="best_within", timeout=0.1, best_within=0.05)
+    assert results == {}
+    assert failures == {"slow": "timeout"}
+    assert elapsed < 0.5
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        asyncio.run(run_fanout({}, policy="fastest"))
+
+
+def stub_branches(monkeypatch, **branches):
+    nodes = {}
+    for key, (delay, error) in branches.items():
+        async def node(state, key=key, delay=delay, error=error):
+            await asyncio.sleep(delay)
+            if error is not None:
+                raise error
+            return {key: f"{key} answer"}
+        nodes[key] = node
+    monkeypatch.setattr(graph, "VISION_BRANCHES", nodes)
+
+
+def test_process_image_raises_when_every_branch_fails(monkeypatch):
+    monkeypatch.setenv("VISION_POLICY", "all")
+    stub_branches(monkeypatch, llama_response=(0.01, RuntimeError("groq down")), gemini_response=(0.01, RuntimeError("gemini down")))
+    with pytest.raises(RuntimeError, match="All vision models failed"):
+        asyncio.run(graph.process_image({"query": "q", "image_ref": "ref"}))
+
+
+def test_first_policy_skips_build_answer(monkeypatch):
+    monkeypatch.setenv("VISION_POLICY", "first")
+    stub_branches(monkeypatch, llama_response=(0.01, None), gemini_response=(5, None))
+    update = asyncio.run(graph.process_image({"query": "q", "image_ref": "ref"}))
+    assert update == {"llama_response": "llama_response answer", "answer": "llama_response answer"}
+    assert graph.route_answer(update) == END
+
+
+def test_all_policy_builds_the_answer_from_both_branches(monkeypatch):
+    monkeypatch.setenv("VISION_POLICY", "all")
+    stub_branches(monkeypatch, llama_response=(0.01, None), gemini_response=(0.02, None))
+    update = asyncio.run(graph.process_image({"query": "q", "image_ref": "ref"}))
+    assert set(update) == {"llama_response", "gemini_response"}
+    assert graph.route_answer(update) == "build answer"
+
+
+def test_default_policy_waits_for_both_branches(monkeypatch):
+    monkeypatch.delenv("VISION_POLICY", raising=False)
+    assert load_fanout_config()["policy"] == "all"
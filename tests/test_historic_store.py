@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.historic_store import HISTORIC_DTYPES, HistoricStore, make_historic_query_tool
+
+
+def make_store(rows):
+    columns = ["State_Name", "District_Name", "Crop", "Season", "Crop_Year", "Area", "Production"]
+    return HistoricStore(pd.DataFrame(rows, columns=columns).astype(HISTORIC_DTYPES))
+
+
+def test_large_production_totals_are_exact():
+    store = make_store([
+        ["Kerala", "Kozhikode", "Coconut", "Whole Year", 2010, 15000.0, 1234567891.0],
+        ["Kerala", "Kozhikode", "Coconut", "Whole Year", 2011, 15000.0, 987654321.0],
+    ])
+    [total] = store.query(crop="coconut", group_by=())
+    assert total["Production"] == 1234567891.0 + 987654321.0
+
+
+def test_missing_production_is_left_out_of_the_yield():
+    store = make_store([
+        ["Punjab", "Ludhiana", "Rice", "Kharif", 2010, 100.0, 400.0],
+        ["Punjab", "Ludhiana", "Rice", "Rabi", 2010, 100.0, np.nan],
+        ["Punjab", "Ludhiana", "Wheat", "Rabi", 2010, 50.0, np.nan],
+    ])
+    by_crop = {row["Crop"]: row for row in store.query(state="punjab", group_by=("crop",))}
+    assert by_crop["Rice"]["Area"] == 200.0
+    assert by_crop["Rice"]["Production"] == 400.0
+    assert by_crop["Rice"]["Yield"] == pytest.approx(4.0)
+    # No known production at all: unknown, not zero.
+    assert by_crop["Wheat"]["Production"] is None
+    assert by_crop["Wheat"]["Yield"] is None
+
+    # The same holds when re-aggregating the raw per-season rows and every pre-aggregated table.
+    for group_by in (("season",), ("year",), ("state",), ("district",)):
+        rows = store.query(crop="rice", group_by=group_by)
+        assert sum(row["Production"] or 0 for row in rows) == 400.0
+    [by_year] = store.query(crop="rice", group_by=("year",))
+    assert by_year["Yield"] == pytest.approx(4.0)
+
+
+def test_query_tool_rejects_non_object_input_and_accepts_string_group_by():
+    store = make_store([
+        ["Punjab", "Ludhiana", "Rice", "Kharif", 2010, 100.0, 400.0],
+        ["Punjab", "Ludhiana", "Wheat", "Rabi", 2010, 50.0, 150.0],
+    ])
+    tool = make_historic_query_tool(store)
+
+    for bad_input in ('["Punjab"]', '"Punjab"', "42", "not json"):
+        assert tool.run(bad_input).startswith("Query failed:")
+
+    rows = json.loads(tool.run('{"state": "punjab", "group_by": "crop"}'))
+    assert sorted(row["Crop"] for row in rows) == ["Rice", "Wheat"]
@@ -0,0 +1,41 @@
+from src.orthomosaic import merge_tile_detections, tile_origins
+
+
+def detection(box, tile, confidence=0.5, class_id=0):
+    return {"box": box, "class_id": class_id, "class_name": "weed", "confidence": confidence, "tile": tile}
+
+
+def test_tile_origins_cover_the_axis_with_a_flush_last_tile():
+    assert tile_origins(500, 640, 128) == [0]
+    assert tile_origins(1500, 640, 128) == [0, 512, 860]
+
+
+def test_duplicate_from_the_overlap_is_merged():
+    merged = merge_tile_detections([
+        detection([500, 100, 560, 160], tile=0, confidence=0.9),
+        detection([502, 101, 561, 159], tile=1, confidence=0.6),
+    ])
+    assert len(merged) == 1
+    assert merged[0]["confidence"] == 0.9
+    assert merged[0]["box"] == [500, 100, 561, 160]
+    assert "tile" not in merged[0]
+
+
+def test_weed_cut_by_a_tile_edge_is_joined():
+    merged = merge_tile_detections([detection([600, 100, 640, 150], tile=0), detection([580, 100, 700, 150], tile=1)])
+    assert [d["box"] for d in merged] == [[580, 100, 700, 150]]
+
+
+def test_same_tile_boxes_are_not_joined_through_another_tile():
+    # A and B are separate weeds from tile 0; C, from tile 1, overlaps both.
+    a = detection([500, 100, 540, 140], tile=0, confidence=0.8)
+    b = detection([545, 100, 585, 140], tile=0, confidence=0.7)
+    c = detection([510, 100, 580, 140], tile=1, confidence=0.6)
+    merged = merge_tile_detections([a, b, c])
+    assert len(merged) == 2
+    assert sorted(d["confidence"] for d in merged) == [0.7, 0.8]
+
+
+def test_different_classes_are_kept_apart():
+    merged = merge_tile_detections([detection([0, 0, 50, 50], tile=0, class_id=0), detection([0, 0, 50, 50], tile=1, class_id=1)])
+    assert len(merged) == 2
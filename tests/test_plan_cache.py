@@ -0,0 +1,118 @@
+import json
+
+import pandas as pd
+import pytest
+from langchain_core.agents import AgentAction
+
+from src.historic_store import HISTORIC_DTYPES, HistoricStore, make_historic_query_tool
+from src.plan_cache import EntityMatcher, QueryPlanCache, _parameterize, _render
+from src.response_cache import InMemoryResponseCache
+
+
+@pytest.fixture(scope="module")
+def store():
+    rows = [
+        [state, district, crop, "Kharif", year, 100.0, 300.0 + year - 2000]
+        for state, districts in {"Punjab": ["Ludhiana", "Amritsar"], "Karnataka": ["Mysore"]}.items()
+        for district in districts
+        for crop in ["Rice", "Wheat"]
+        for year in range(2000, 2011)
+    ]
+    columns = ["State_Name", "District_Name", "Crop", "Season", "Crop_Year", "Area", "Production"]
+    return HistoricStore(pd.DataFrame(rows, columns=columns).astype(HISTORIC_DTYPES))
+
+
+@pytest.fixture
+def plan_cache(store):
+    return QueryPlanCache(InMemoryResponseCache("historic_plan"), lambda: store)
+
+
+@pytest.fixture
+def tools(store):
+    tool = make_historic_query_tool(store)
+    return {tool.name: tool}
+
+
+def step(tool_input, observation="[...]", tool="historic_crop_query"):
+    return AgentAction(tool, tool_input, ""), observation
+
+
+def test_parameterize_and_render_round_trip():
+    entities = {"district_0": "Ludhiana", "crop_0": "Rice", "year_0": "2003", "year_1": "2006"}
+    code = "df[(df.District_Name == 'Ludhiana') & (df.Crop.str.lower() == 'rice') & df.Crop_Year.between(2003, 2006)]  # RICE"
+
+    template = _parameterize(code, entities)
+
+    for value in ("Ludhiana", "rice", "RICE", "2003", "2006"):
+        assert value not in template
+    assert "__crop_0_lower__" in template and "__crop_0_upper__" in template
+    assert _render(template, entities) == code
+
+
+def test_entities_are_substituted_on_replay(store):
+    matcher = EntityMatcher(store)
+    key, entities = matcher.extract("What was the yield of Rice in Ludhiana from 2003 to 2006?")
+    other_key, other_entities = matcher.extract("what was the yield of wheat in mysore from 2001 to 2009")
+
+    assert key == other_key == "what was the yield of __crop_0__ in __district_0__ from __year_0__ to __year_1__"
+    assert entities == {"crop_0": "Rice", "district_0": "Ludhiana", "year_0": "2003", "year_1": "2006"}
+    template = _parameterize('{"district": "Ludhiana", "crop": "rice", "year_from": 2003, "year_to": 2006}', entities)
+    assert json.loads(_render(template, other_entities)) == {
+        "district": "Mysore", "crop": "wheat", "year_from": 2001, "year_to": 2009,
+    }
+
+
+def test_replay_uses_the_new_question_entities(plan_cache, tools):
+    steps = [step('{"district": "Ludhiana", "crop": "Rice", "year_from": 2003, "year_to": 2006}')]
+    assert plan_cache.capture("Yield of Rice in Ludhiana from 2003 to 2006", steps, tools, agent_seconds=5.0)
+
+    match = plan_cache.lookup("yield of wheat in mysore from 2001 to 2002")
+    assert match is not None
+    output = plan_cache.replay(*match, tools)
+
+    rows = json.loads(output.split("result:\n", 1)[1])
+    assert [row["Crop_Year"] for row in rows] == [2001, 2002]
+    assert plan_cache.stats()["replays"] == 1
+
+
+def test_failed_steps_are_left_out_of_the_plan(plan_cache, tools):
+    steps = [
+        step('{"district": "Ludhiana", "crop": "Rice", "group_by": "crop"}', observation="Query failed: 'crop'"),
+        step("df.head()", observation="NameError: name 'df' is not defined", tool="python_repl_ast"),
+        step('{"district": "Ludhiana", "crop": "Rice"}'),
+    ]
+    tools = {**tools, "python_repl_ast": None}
+    assert plan_cache.capture("Rice in Ludhiana", steps, tools, agent_seconds=5.0)
+
+    plan, _ = plan_cache.lookup("Wheat in Amritsar")
+    assert [s["input"] for s in plan["steps"]] == ['{"district": "__district_0__", "crop": "__crop_0__"}']
+
+
+def test_plan_naming_an_entity_the_question_does_not_is_not_stored(plan_cache, tools):
+    steps = [step('{"state": "Punjab", "district": "Ludhiana", "crop": "Wheat"}')]
+    assert not plan_cache.capture("Wheat production in Ludhiana", steps, tools, agent_seconds=5.0)
+
+
+def test_unknown_entity_is_a_miss(plan_cache, tools):
+    assert plan_cache.capture("Rice in Ludhiana", [step('{"district": "Ludhiana", "crop": "Rice"}')], tools, agent_seconds=5.0)
+
+    # "Bajra" is not a crop in the store, so the question has a different shape.
+    assert plan_cache.lookup("Bajra in Ludhiana") is None
+    assert plan_cache.lookup("Rice in Atlantis") is None
+    assert plan_cache.lookup("Wheat in Mysore") is not None
+
+
+def test_broken_plan_cache_falls_back_to_the_agent(plan_cache):
+    from types import SimpleNamespace
+
+    from src.helper import query_historic_data_llm
+
+    def broken_lookup(query):
+        raise RuntimeError("corrupt plan")
+
+    plan_cache.lookup = broken_lookup
+    agent = SimpleNamespace(tools=[], invoke=lambda messages: {"output": "agent output", "intermediate_steps": []})
+    llm = SimpleNamespace(stream=lambda messages: [SimpleNamespace(content=messages[-1].content.rsplit(": ", 1)[1])])
+
+    assert list(query_historic_data_llm(agent, llm, "Rice in Ludhiana", plan_cache=plan_cache)) == ["agent output"]
+    assert plan_cache.stats()["errors"] == 1
@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+from src.helper import query_historic_data_llm
+from src.response_cache import InMemoryResponseCache, SQLiteResponseCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryResponseCache("test")
+    return SQLiteResponseCache("test", str(tmp_path / "responses.sqlite3"))
+
+
+def test_lookups_are_counted_exactly_under_concurrency(cache):
+    cache.set("What is the yield?", "42")
+
+    def lookups():
+        for _ in range(200):
+            cache.get("what is the YIELD")
+            cache.get("unknown question")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1600, 1600)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cached_answer_is_streamed_in_chunks(cache):
+    answer = "Rice yield in Punjab rose\nfrom 3.1 to  4.0 t/ha."
+    cache.set("rice yield punjab", answer)
+
+    chunks = list(query_historic_data_llm(agent_executor=None, llm_gemini=None, query="Rice yield, Punjab?", cache=cache))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == answer
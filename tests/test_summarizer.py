@@ -0,0 +1,109 @@
+import asyncio
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import START, StateGraph
+from langgraph.graph.message import add_messages
+
+from src.checkpoint import BoundedSqliteSaver
+from src.summarizer import ConversationSummarizer, ThreadLocks, split_for_summary
+
+
+def conversation(turns, words=20):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"question {i} " + "word " * words, id=f"h{i}"))
+        messages.append(AIMessage(content=f"answer {i} " + "word " * words, id=f"a{i}"))
+    return messages
+
+
+def test_nothing_is_summarized_under_budget():
+    messages = conversation(2)
+    assert split_for_summary(messages, token_budget=count_tokens_approximately(messages), keep_tokens=0) == ([], messages)
+
+
+def test_newest_messages_within_keep_tokens_are_kept():
+    messages = conversation(6)
+    keep_tokens = count_tokens_approximately(messages[-4:])
+
+    to_summarize, to_keep = split_for_summary(messages, token_budget=10, keep_tokens=keep_tokens)
+
+    assert to_summarize + to_keep == messages
+    assert to_keep == messages[-4:]
+
+
+def test_at_least_keep_messages_are_kept():
+    messages = conversation(6)
+
+    to_summarize, to_keep = split_for_summary(messages, token_budget=10, keep_tokens=0, keep_messages=3)
+
+    assert to_summarize == messages[:-3]
+    assert to_keep == messages[-3:]
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    summary: str
+
+
+class StubLLM:
+
+    def __init__(self):
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages)
+        return AIMessage(content=f"summary of {len(messages) - 1} messages")
+
+
+def build_graph(checkpointer):
+    builder = StateGraph(State)
+    builder.add_node("chat model", lambda state: {})
+    builder.add_edge(START, "chat model")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_summarize_folds_old_messages_into_the_summary():
+    graph = build_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "t"}}
+    messages = conversation(6)
+    graph.invoke({"messages": messages}, config)
+
+    llm = StubLLM()
+    keep_tokens = count_tokens_approximately(messages[-4:])
+    summarizer = ConversationSummarizer(graph, lambda: llm, token_budget=10, keep_tokens=keep_tokens)
+
+    assert asyncio.run(summarizer.summarize(config)) is True
+
+    values = graph.get_state(config).values
+    assert values["summary"] == "summary of 8 messages"
+    assert [m.id for m in values["messages"]] == [m.id for m in messages[-4:]]
+    # Only the dropped messages are sent, followed by the instruction.
+    [sent] = llm.calls
+    assert [m.id for m in sent[:-1]] == [m.id for m in messages[:-4]]
+
+    # Under budget now: no second LLM call.
+    summarizer.token_budget = 10_000
+    assert asyncio.run(summarizer.summarize(config)) is False
+    assert len(llm.calls) == 1
+
+
+def test_thread_locks_serialize_turns_across_workers(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    # Two savers on one file stand in for two workers.
+    workers = [ThreadLocks(BoundedSqliteSaver.from_path(path), poll_interval=0.01) for _ in range(2)]
+    events = []
+
+    async def turn(locks, name):
+        async with locks.hold("t"):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(turn(workers[0], "a"), turn(workers[1], "b"))
+
+    asyncio.run(run())
+    assert events in (["a start", "a end", "b start", "b end"], ["b start", "b end", "a start", "a end"])
@@ -0,0 +1,140 @@
+"""
+Accuracy parity of the optimized soil and weed backends against the fp32 models, on deterministic
+synthetic fixture images. Backends whose optional dependency is missing are skipped.
+
+The soil tests use the trained weights when ./models/soiltype_mobilenet_CNN.pt exists and seeded
+random weights otherwise; the int8 tolerances only mean something for the trained model, so those
+tests need the checkpoint. The weed tests need ./models/weed_detector.pt.
+"""
+import importlib.util
+import os
+import shutil
+
+import numpy as np
+import pytest
+import torch
+
+from benchmarks.fixtures import soil_image, weed_image
+from src.vision_backends import (
+    WEED_CHECKPOINT,
+    check_soil_parity,
+    check_weed_parity,
+    export_soil_backend,
+    export_weed_backend,
+    load_soil_backend,
+)
+
+
+SOIL_CHECKPOINT = "./models/soiltype_mobilenet_CNN.pt"
+
+# backend -> (max logit diff, max softmax diff, min top-1 agreement)
+SOIL_TOLERANCES = {
+    "channels_last": (1e-3, 1e-4, 1.0),
+    "compile": (1e-3, 1e-4, 1.0),
+    "torchscript": (1e-3, 1e-4, 1.0),
+    "onnx": (1e-3, 1e-4, 1.0),
+    "int8_dynamic": (0.5, 0.05, 0.95),
+    "int8_static": (1.5, 0.15, 0.9),
+}
+SOIL_INT8_BACKENDS = ("int8_dynamic", "int8_static")
+# backend -> (min recall and precision vs fp32, max relative difference in box count)
+WEED_TOLERANCES = {
+    "torchscript": (0.95, 0.05),
+    "onnx": (0.95, 0.05),
+    "openvino": (0.95, 0.05),
+    "openvino_int8": (0.85, 0.15),
+}
+BACKEND_DEPENDENCIES = {"onnx": ("onnx", "onnxruntime"), "openvino": ("openvino",), "openvino_int8": ("openvino", "nncf")}
+
+
+def require_dependencies(backend):
+    for module in BACKEND_DEPENDENCIES.get(backend, ()):
+        if importlib.util.find_spec(module) is None:
+            pytest.skip(f"{backend} needs the optional dependency {module}")
+    if backend == "compile":
+        require_torch_compile()
+
+
+def require_torch_compile():
+    # torch.compile needs a working C++ toolchain on CPU; without one the first call fails.
+    if not hasattr(torch, "compile"):
+        pytest.skip("compile needs torch.compile (torch >= 2.0)")
+    try:
+        torch.compile(lambda x: x + 1)(torch.zeros(1))
+    except Exception as e:
+        pytest.skip(f"torch.compile is unavailable here: {e}")
+
+
+@pytest.fixture(scope="module")
+def soil_model():
+    from src.model_arch import MobileeNetV2
+
+    torch.manual_seed(0)
+    model = MobileeNetV2(num_classes=4)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    checkpoint = os.path.join(root, SOIL_CHECKPOINT)
+    if os.path.exists(checkpoint):
+        model.load_state_dict(torch.load(checkpoint, map_location="cpu", weights_only=True))
+    return model.eval(), os.path.exists(checkpoint)
+
+
+@pytest.fixture(scope="module")
+def soil_batch():
+    from src.helper import soil_image_to_tensor
+
+    rng = np.random.default_rng(0)
+    return torch.stack([soil_image_to_tensor(soil_image(rng, size=256)) for _ in range(32)])
+
+
+@pytest.mark.parametrize("backend", list(SOIL_TOLERANCES))
+def test_soil_backend_parity(backend, soil_model, soil_batch, tmp_path):
+    require_dependencies(backend)
+    model, trained = soil_model
+    if backend in SOIL_INT8_BACKENDS and not trained:
+        pytest.skip(f"{backend} accuracy is only checked on the trained weights ({SOIL_CHECKPOINT})")
+
+    path = None
+    if backend in ("torchscript", "int8_static", "onnx"):
+        path = export_soil_backend(model, backend, path=str(tmp_path / f"soil.{backend}"), calibration=soil_batch)
+    candidate = load_soil_backend(lambda: model, backend, path=path)
+
+    max_logit_diff, max_abs_diff, min_top1 = SOIL_TOLERANCES[backend]
+    parity = check_soil_parity(model, candidate, soil_batch)
+    assert parity["max_logit_diff"] <= max_logit_diff
+    assert parity["max_abs_diff"] <= max_abs_diff
+    assert parity["top1_agreement"] >= min_top1
+
+
+@pytest.fixture(scope="module")
+def weed_checkpoint(tmp_path_factory):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    checkpoint = os.path.join(root, WEED_CHECKPOINT)
+    if not os.path.exists(checkpoint):
+        pytest.skip(f"The weed parity tests need the trained detector ({WEED_CHECKPOINT})")
+    # Ultralytics writes exports next to the checkpoint; keep them out of models/.
+    copy = tmp_path_factory.mktemp("weeds") / "weed_detector.pt"
+    shutil.copy(checkpoint, copy)
+    return str(copy)
+
+
+@pytest.fixture(scope="module")
+def weed_images():
+    import cv2
+
+    rng = np.random.default_rng(0)
+    return [cv2.cvtColor(np.asarray(weed_image(rng, size=640)), cv2.COLOR_RGB2BGR) for _ in range(8)]
+
+
+@pytest.mark.parametrize("backend", list(WEED_TOLERANCES))
+def test_weed_backend_parity(backend, weed_checkpoint, weed_images):
+    require_dependencies(backend)
+    from ultralytics import YOLO
+
+    path = export_weed_backend(backend, checkpoint=weed_checkpoint, imgsz=640)
+    parity = check_weed_parity(YOLO(weed_checkpoint), YOLO(path, task="detect"), weed_images, imgsz=640, conf=0.25)
+
+    min_match, max_count_diff = WEED_TOLERANCES[backend]
+    assert parity["recall_vs_fp32"] >= min_match
+    assert parity["precision_vs_fp32"] >= min_match
+    reference = parity["reference_detections"]
+    assert abs(parity["candidate_detections"] - reference) <= max_count_diff * max(reference, 1)